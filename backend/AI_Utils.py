@@ -1,9 +1,49 @@
 import openai
 import os
 import json
-from music21 import stream, note, chord, tempo, meter, metadata
+import time
+import queue
+import asyncio
+import threading
+from notation import score_from_generated
 from datetime import datetime
 
+def build_messages(user_instruction):
+    """
+    Builds the chat messages asking the model for a JSON array of notes.
+    """
+    return [
+
+        {
+            "role": "system",
+            "content": (
+                "You are an experimental AI music composer specializing in creating expressive and genre-specific music compositions. "
+                "Your task is to generate a JSON array of musical notes that adhere strictly to the following format: "
+                "[{\"time\": <float>, \"pitch\": <int>, \"duration\": <float>, \"velocity\": <int>}]. "
+                "Each note must have these properties:\n"
+                "- time: The time the note starts (in seconds, a float).\n"
+                "- pitch: The MIDI pitch of the note (an integer between 60-72, representing C4 to C5).\n"
+                "- duration: The duration of the note (in seconds, a float).\n"
+                "- velocity: The volume of the note (an integer between 0-127).\n\n"
+                "You may vary the time, pitch, duration, and velocity creatively, within these constraints. "
+                "The generated music should align with the user's provided genre, mood, or pattern instructions. "
+                "Output only the JSON array, without any additional text or explanations."
+            )
+        },
+        {
+            "role": "user",
+            "content": (
+                "Generate a JSON array of notes like this:\n"
+                "[\n"
+                "  { \"time\": 0.0, \"pitch\": 60, \"duration\": 0.5, \"velocity\": 90 },\n"
+                "  { \"time\": 0.5, \"pitch\": 63, \"duration\": 0.5, \"velocity\": 85 },\n"
+                "  ...\n"
+                "]\n"
+                "Based on the following instruction: " + user_instruction
+            )
+        }
+    ]
+
 def generate_notes_from_instructions(user_instruction):
     """
     Generates MIDI-compatible note data from user instructions.
@@ -17,38 +57,7 @@ def generate_notes_from_instructions(user_instruction):
 
         response = openai.ChatCompletion.create(
             model="gpt-4",
-            messages = [
-
-                {
-                    "role": "system",
-                    "content": (
-                        "You are an experimental AI music composer specializing in creating expressive and genre-specific music compositions. "
-                        "Your task is to generate a JSON array of musical notes that adhere strictly to the following format: "
-                        "[{\"time\": <float>, \"pitch\": <int>, \"duration\": <float>, \"velocity\": <int>}]. "
-                        "Each note must have these properties:\n"
-                        "- time: The time the note starts (in seconds, a float).\n"
-                        "- pitch: The MIDI pitch of the note (an integer between 60-72, representing C4 to C5).\n"
-                        "- duration: The duration of the note (in seconds, a float).\n"
-                        "- velocity: The volume of the note (an integer between 0-127).\n\n"
-                        "You may vary the time, pitch, duration, and velocity creatively, within these constraints. "
-                        "The generated music should align with the user's provided genre, mood, or pattern instructions. "
-                        "Output only the JSON array, without any additional text or explanations."
-                    )
-                },
-                {
-                    "role": "user",
-                    "content": (
-                        "Generate a JSON array of notes like this:\n"
-                        "[\n"
-                        "  { \"time\": 0.0, \"pitch\": 60, \"duration\": 0.5, \"velocity\": 90 },\n"
-                        "  { \"time\": 0.5, \"pitch\": 63, \"duration\": 0.5, \"velocity\": 85 },\n"
-                        "  ...\n"
-                        "]\n"
-                        "Based on the following instruction: " + user_instruction
-                    )
-                }
-            ],
-
+            messages=build_messages(user_instruction),
             temperature=0.9
         )
 
@@ -62,6 +71,32 @@ def generate_notes_from_instructions(user_instruction):
         return None
 
 
+def validate_note(note):
+    """
+    Validates the structure and values of a single generated note.
+    """
+    if not isinstance(note, dict):
+        return False
+
+    # Check if all required keys are present
+    if not all(key in note for key in ('time', 'pitch', 'duration', 'velocity')):
+        return False
+
+    # Validate data types and ranges
+    if not isinstance(note['time'], (int, float)) or note['time'] < 0:
+        return False
+
+    if not isinstance(note['pitch'], int) or not (0 <= note['pitch'] <= 127):
+        return False
+
+    if not isinstance(note['duration'], (int, float)) or note['duration'] <= 0:
+        return False
+
+    if not isinstance(note['velocity'], int) or not (0 <= note['velocity'] <= 127):
+        return False
+
+    return True
+
 def validate_notes(notes):
     """
     Validates the structure and values of generated note data.
@@ -69,29 +104,9 @@ def validate_notes(notes):
     if not isinstance(notes, list):
         return False
 
-    required_keys = {'time', 'pitch', 'duration', 'velocity'}
-    
-    for note in notes:
-        # Check if all required keys are present
-        if not all(key in note for key in required_keys):
-            return False
-            
-        # Validate data types and ranges
-        if not isinstance(note['time'], (int, float)) or note['time'] < 0:
-            return False
-        
-        if not isinstance(note['pitch'], int) or not (0 <= note['pitch'] <= 127):
-            return False
-        
-        if not isinstance(note['duration'], (int, float)) or note['duration'] <= 0:
-            return False
-        
-        if not isinstance(note['velocity'], int) or not (0 <= note['velocity'] <= 127):
-            return False
-            
-    return True
+    return all(validate_note(note) for note in notes)
 
-def create_sheet_music_from_notes(notes, output_path, title):
+def create_sheet_music_from_notes(notes, output_path, title, filename=None):
     """
     Creates a sheet music PDF from a list of notes.
     
@@ -99,33 +114,18 @@ def create_sheet_music_from_notes(notes, output_path, title):
         notes (list): List of note dictionaries
         output_path (str): Path to save the PDF
         title (str): Title for the sheet music
+        filename (str): Optional PDF filename, generated from the timestamp if omitted
         
     Returns:
         tuple: (success, message, filename)
     """
     try:
-        # Create a music21 stream
-        sheet_music = stream.Stream()
-        
-        # Add metadata
-        sheet_music.metadata = metadata.Metadata()
-        sheet_music.metadata.title = title
-        
-        # Add time signature and tempo
-        sheet_music.append(tempo.MetronomeMark(number=120))
-        sheet_music.append(meter.TimeSignature('4/4'))
-        
-        # Add the notes to the stream
-        for note_data in notes:
-            n = note.Note(note_data['pitch'])
-            n.duration.quarterLength = note_data['duration'] * 4  # Convert to music21 duration
-            n.volume.velocity = note_data['velocity']
-            # Set the offset (start time) for the note
-            n.offset = note_data['time'] * 4  # Convert to music21 time units
-            sheet_music.append(n)
+        # Quantize the notes and lay them out into measures
+        sheet_music = score_from_generated(notes, title=title)
         
         # Generate unique filename
-        filename = f"notes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+        if filename is None:
+            filename = f"notes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
         filepath = os.path.join(output_path, filename)
         
         # Write to PDF
@@ -164,7 +164,7 @@ def process_music_generation(instructions, output_path):
         }
     
     # Create sheet music
-    success, message, filename = create_sheet_music_from_notes(notes, output_path)
+    success, message, filename = create_sheet_music_from_notes(notes, output_path, "AI powered notes")
     
     if not success:
         return {
@@ -176,4 +176,224 @@ def process_music_generation(instructions, output_path):
         "status": "success",
         "message": "Sheet music generated successfully",
         "filename": filename
-    }
\ No newline at end of file
+    }
+
+
+async def openai_completion(messages):
+    """
+    Default async completion backend, calling the OpenAI chat API.
+    Returns the message content of the first choice.
+    """
+    openai.api_key = os.getenv("OPENAI_API_KEY")
+    if not openai.api_key:
+        raise RuntimeError("OpenAI API key not found")
+
+    response = await openai.ChatCompletion.acreate(
+        model="gpt-4",
+        messages=messages,
+        temperature=0.9
+    )
+    return response['choices'][0]['message']['content']
+
+async def generate_notes_async(instruction, completion=None, timeout=60.0, retries=2, backoff=0.5):
+    """
+    Generates and validates notes for one instruction without blocking the event loop.
+    
+    Args:
+        instruction (str): User instructions for music generation
+        completion (callable): Async function taking chat messages and returning the content,
+            defaults to openai_completion (swap in a stub for benchmarks)
+        timeout (float): Seconds allowed per completion call
+        retries (int): Extra attempts after a failed, timed out or invalid completion
+        backoff (float): Base delay in seconds between attempts, doubled every retry
+        
+    Returns:
+        tuple: (notes or None, error message or None, attempts)
+    """
+    completion = completion or openai_completion
+    error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            await asyncio.sleep(backoff * 2 ** (attempt - 1))
+        try:
+            content = await asyncio.wait_for(completion(build_messages(instruction)), timeout)
+            notes = json.loads(content)
+        except asyncio.TimeoutError:
+            error = f"Completion timed out after {timeout}s"
+            continue
+        except Exception as e:
+            error = f"Error generating notes: {e}"
+            continue
+        if validate_notes(notes):
+            return notes, None, attempt + 1
+        error = "Generated notes failed validation"
+    return None, error, retries + 1
+
+async def generate_batch(instructions, concurrency=4, **kwargs):
+    """
+    Runs generate_notes_async for every instruction with at most `concurrency`
+    completions in flight. Yields one result dict per instruction as soon as it
+    finishes, so the order follows completion time, not input order.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(index, instruction):
+        async with semaphore:
+            started = time.perf_counter()
+            notes, error, attempts = await generate_notes_async(instruction, **kwargs)
+            return {
+                "index": index,
+                "instruction": instruction,
+                "notes": notes,
+                "error": error,
+                "attempts": attempts,
+                "elapsed": time.perf_counter() - started
+            }
+
+    tasks = [asyncio.ensure_future(run(i, instruction)) for i, instruction in enumerate(instructions)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def iter_batch(instructions, **kwargs):
+    """
+    Runs generate_batch on its own event loop in a background thread and yields
+    its results synchronously, for use from Flask request handlers.
+    Closing the generator (e.g. the client disconnected) cancels the batch,
+    so no further completions or retries are made.
+    """
+    results = queue.Queue()
+    done = object()
+    stopped = threading.Event()
+    running = {}
+    lock = threading.Lock()
+
+    async def consume():
+        with lock:
+            if stopped.is_set():
+                results.put(done)
+                return
+            running["loop"], running["task"] = asyncio.get_running_loop(), asyncio.current_task()
+        try:
+            async for result in generate_batch(instructions, **kwargs):
+                results.put(result)
+        except asyncio.CancelledError:
+            pass  # Abandoned by the consumer
+        except Exception as e:
+            print(f"Error in batch generation: {e}")
+        finally:
+            results.put(done)
+
+    threading.Thread(target=asyncio.run, args=(consume(),), daemon=True).start()
+    try:
+        while True:
+            result = results.get()
+            if result is done:
+                return
+            yield result
+    finally:
+        with lock:
+            stopped.set()
+            if "task" in running:
+                try:
+                    # Cancelling consume() lets generate_batch's finally cancel the completions
+                    running["loop"].call_soon_threadsafe(running["task"].cancel)
+                except RuntimeError:
+                    pass  # The loop already finished
+
+
+class NoteStreamParser:
+    """
+    Incrementally parses a JSON array of note objects arriving in arbitrary
+    text chunks. feed() returns every object completed by the chunk, so notes
+    become available while the rest of the array is still being generated.
+    Text before the top-level array (prose, a code fence) is ignored, even if
+    it contains braces. An object that isn't valid JSON is returned as its raw
+    text so the caller can report it as an invalid note.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.closed = False
+        self.current = []
+
+    def feed(self, chunk):
+        objects = []
+        for char in chunk:
+            if self.closed:
+                break
+            if self.depth == 0:
+                # Nothing counts until the top-level array opens
+                if char == '[':
+                    self.depth = 1
+                continue
+            if self.depth >= 2:
+                self.current.append(char)
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in '[{':
+                self.depth += 1
+                if self.depth == 2:
+                    self.current = [char]
+            elif char in ']}':
+                self.depth -= 1
+                if self.depth == 1 and char == '}':
+                    text = ''.join(self.current)
+                    try:
+                        objects.append(json.loads(text))
+                    except json.JSONDecodeError:
+                        objects.append(text)
+                    self.current = []
+                elif self.depth == 0:
+                    self.closed = True
+        return objects
+
+def stream_openai_completion(messages):
+    """
+    Default streaming completion backend. Yields the response text piece by piece.
+    """
+    openai.api_key = os.getenv("OPENAI_API_KEY")
+    if not openai.api_key:
+        raise RuntimeError("OpenAI API key not found")
+
+    for chunk in openai.ChatCompletion.create(
+        model="gpt-4",
+        messages=messages,
+        temperature=0.9,
+        stream=True
+    ):
+        content = chunk['choices'][0]['delta'].get('content')
+        if content:
+            yield content
+
+def stream_notes_from_instructions(user_instruction, stream_completion=None):
+    """
+    Streaming variant of generate_notes_from_instructions.
+    Yields (note, is_valid) for every note object as soon as its closing brace
+    arrives; invalid notes are reported rather than dropping the whole response.
+    
+    Args:
+        user_instruction (str): User instructions for music generation
+        stream_completion (callable): Function taking chat messages and yielding text,
+            defaults to stream_openai_completion (swap in a stub for local runs)
+    """
+    stream_completion = stream_completion or stream_openai_completion
+    parser = NoteStreamParser()
+    for chunk in stream_completion(build_messages(user_instruction)):
+        for note in parser.feed(chunk):
+            yield note, validate_note(note)
+        if parser.closed:
+            break
@@ -0,0 +1,220 @@
+import io
+import os
+import sys
+import time
+import base64
+import threading
+from datetime import datetime
+import torch
+from PIL import Image
+from diffusers import StableDiffusionPipeline, DPMSolverMultistepScheduler
+
+MODEL_ID = "CompVis/stable-diffusion-v1-4"
+
+# Generation settings per device. The CPU profile trades detail for speed:
+# a multistep solver that converges in few steps, a smaller canvas that is
+# upscaled afterwards, attention/VAE slicing to bound memory, and optionally
+# bfloat16 weights (DIFFUSION_DTYPE=bfloat16).
+DIFFUSION_PROFILES = {
+    "gpu": {
+        "device": "cuda",
+        "dtype": "float16",
+        "scheduler": None,
+        "steps": 50,
+        "size": 512,
+        "upscale_to": None,
+        "attention_slicing": False,
+        "preview_every": 10,
+    },
+    "cpu": {
+        "device": "cpu",
+        "dtype": "float32",
+        "scheduler": "dpm-solver++",
+        "steps": 15,
+        "size": 384,
+        "upscale_to": 512,
+        "attention_slicing": True,
+        "preview_every": 3,
+    },
+}
+
+# Approximate linear map from SD v1 latents to RGB, used for cheap previews
+# without running the VAE decoder
+LATENT_RGB_FACTORS = [
+    [0.298, 0.207, 0.208],
+    [0.187, 0.286, 0.173],
+    [-0.158, 0.189, 0.264],
+    [-0.184, -0.271, -0.473],
+]
+
+# Loaded pipelines by configuration, so switching profiles doesn't reload the model
+pipelines = {}
+pipeline_lock = threading.Lock()
+
+
+def get_profile(name=None):
+    """
+    Resolve the diffusion profile: the given name, DIFFUSION_PROFILE, or
+    "gpu"/"cpu" depending on CUDA. DIFFUSION_STEPS, DIFFUSION_SIZE,
+    DIFFUSION_DTYPE, DIFFUSION_UPSCALE (0 to disable) and DIFFUSION_THREADS
+    override single settings. Raises ValueError for unknown profiles and for
+    profiles this machine can't run.
+    """
+    name = name or os.getenv("DIFFUSION_PROFILE") or ("gpu" if torch.cuda.is_available() else "cpu")
+    if not isinstance(name, str) or name not in DIFFUSION_PROFILES:
+        raise ValueError(f"Unknown diffusion profile '{name}'")
+    profile = dict(DIFFUSION_PROFILES[name], name=name)
+    if profile["device"] == "cuda" and not torch.cuda.is_available():
+        raise ValueError(f"Diffusion profile '{name}' needs CUDA, which is not available")
+    if os.getenv("DIFFUSION_STEPS"):
+        profile["steps"] = int(os.getenv("DIFFUSION_STEPS"))
+    if os.getenv("DIFFUSION_SIZE"):
+        profile["size"] = int(os.getenv("DIFFUSION_SIZE"))
+    if os.getenv("DIFFUSION_DTYPE"):
+        profile["dtype"] = os.getenv("DIFFUSION_DTYPE")
+    if os.getenv("DIFFUSION_UPSCALE"):
+        profile["upscale_to"] = int(os.getenv("DIFFUSION_UPSCALE")) or None
+    profile["threads"] = int(os.getenv("DIFFUSION_THREADS", "0")) or None
+    return profile
+
+
+def load_pipeline(profile):
+    """Load (or reuse) the StableDiffusion pipeline configured for the profile."""
+    key = (profile["device"], profile["dtype"], profile["scheduler"], profile["attention_slicing"])
+    if key in pipelines:
+        return pipelines[key]
+
+    print(f"Loading StableDiffusion pipeline ({profile['name']} profile)...")
+    pipe = StableDiffusionPipeline.from_pretrained(MODEL_ID, torch_dtype=getattr(torch, profile["dtype"]))
+    pipe = pipe.to(profile["device"])
+    pipe.safety_checker = None
+    if profile["scheduler"] == "dpm-solver++":
+        pipe.scheduler = DPMSolverMultistepScheduler.from_config(
+            pipe.scheduler.config, algorithm_type="dpmsolver++", use_karras_sigmas=True
+        )
+    if profile["attention_slicing"]:
+        pipe.enable_attention_slicing()
+        pipe.enable_vae_slicing()
+    pipe.set_progress_bar_config(disable=True)
+
+    pipelines[key] = pipe
+    return pipe
+
+
+def current_memory_bytes(device):
+    """Resident memory of this process (or allocated CUDA memory), in bytes."""
+    if device == "cuda":
+        return torch.cuda.memory_allocated()
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        pass
+    # No procfs: fall back to the lifetime peak (bytes on macOS, kilobytes elsewhere).
+    # Imported here because the resource module only exists on POSIX
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def latents_to_preview(latents, size=256):
+    """Turn the current latents into a small PNG (base64) without decoding through the VAE."""
+    factors = torch.tensor(LATENT_RGB_FACTORS, dtype=torch.float32)
+    rgb = torch.einsum("chw,cr->hwr", latents[0].float().cpu(), factors)
+    rgb = ((rgb + 1) / 2).clamp(0, 1).mul(255).byte().numpy()
+    image = Image.fromarray(rgb).resize((size, size), Image.BILINEAR)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def build_prompt(notes):
+    """Create a prompt based on the notes."""
+    note_colors = {
+        "C": "red", "D": "green", "E": "blue", "F": "yellow",
+        "G": "purple", "A": "orange", "B": "pink", "C_high": "cyan"
+    }
+
+    prompt_elements = [f"{note_colors.get(note, 'colorful')} light" for note in notes]
+    return (
+        "A detailed, vibrant abstract album cover featuring swirling, "
+        "dynamic patterns of " + ", ".join(prompt_elements) + ". "
+        "Highly artistic, detailed, and modern design, perfect for a modern album."
+    )
+
+
+def generate_abstract_album_cover(notes, images_folder, on_preview=None, profile_name=None):
+    """
+    Generate an abstract, detailed album cover based on the most recent notes played.
+
+    `on_preview(step, total_steps, png_base64)` is called every few steps with
+    a low resolution preview. Returns (image_path, stats) where stats has the
+    load and generation time and the peak memory sampled during generation.
+    """
+    profile = get_profile(profile_name)
+
+    with pipeline_lock:
+        if profile["threads"]:
+            torch.set_num_threads(profile["threads"])
+
+        load_started = time.perf_counter()
+        pipe = load_pipeline(profile)
+        load_seconds = time.perf_counter() - load_started
+
+        device = profile["device"]
+        if device == "cuda":
+            torch.cuda.reset_peak_memory_stats()
+        peak_memory = current_memory_bytes(device)
+
+        def on_step_end(pipe, step, timestep, callback_kwargs):
+            nonlocal peak_memory
+            peak_memory = max(peak_memory, current_memory_bytes(device))
+            if on_preview is not None and (step + 1) % profile["preview_every"] == 0:
+                on_preview(step + 1, profile["steps"], latents_to_preview(callback_kwargs["latents"]))
+            return callback_kwargs
+
+        started = time.perf_counter()
+        with torch.inference_mode():
+            image = pipe(
+                build_prompt(notes),
+                guidance_scale=7.5,
+                num_inference_steps=profile["steps"],
+                width=profile["size"],
+                height=profile["size"],
+                callback_on_step_end=on_step_end,
+                callback_on_step_end_tensor_inputs=["latents"],
+            ).images[0]
+        generation_seconds = time.perf_counter() - started
+
+        if device == "cuda":
+            peak_memory = max(peak_memory, torch.cuda.max_memory_allocated())
+        else:
+            peak_memory = max(peak_memory, current_memory_bytes(device))
+
+    if profile["upscale_to"] and profile["upscale_to"] > image.width:
+        image = image.resize((profile["upscale_to"], profile["upscale_to"]), Image.LANCZOS)
+
+    # Ensure the images folder exists
+    os.makedirs(images_folder, exist_ok=True)
+
+    # Use the current timestamp for the filename
+    filename = f"abstract_album_cover_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
+    image_path = os.path.join(images_folder, filename)
+    image.save(image_path)
+
+    stats = {
+        "profile": profile["name"],
+        "steps": profile["steps"],
+        "size": profile["size"],
+        "output_size": image.width,
+        "dtype": profile["dtype"],
+        "threads": torch.get_num_threads() if device == "cpu" else None,
+        "load_seconds": round(load_seconds, 3),
+        "generation_seconds": round(generation_seconds, 3),
+        "peak_memory_mb": round(peak_memory / (1024 * 1024), 1),
+    }
+    print(f"Album cover generated: {stats}")
+    return image_path, stats
@@ -0,0 +1,52 @@
+"""
+Throughput of the concurrent batch generation pipeline against the local
+completion stub. No network or API key needed.
+
+    python benchmarks/bench_batch_generation.py --count 32 --latency 0.5 --concurrency 1 4 8 16
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AI_Utils import generate_batch
+from completion_stub import make_stub_completion
+
+
+async def run_batch(count, concurrency, completion, timeout, retries):
+    started = time.perf_counter()
+    valid = 0
+    async for result in generate_batch(
+        [f"variation {i}" for i in range(count)],
+        concurrency=concurrency,
+        completion=completion,
+        timeout=timeout,
+        retries=retries,
+        backoff=0.0
+    ):
+        if result["notes"] is not None:
+            valid += 1
+    return time.perf_counter() - started, valid
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=5.0)
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    print(f"{'concurrency':>12} {'seconds':>10} {'valid':>8} {'per sec':>10}")
+    for concurrency in args.concurrency:
+        completion = make_stub_completion(args.latency, args.jitter, args.failure_rate, seed=concurrency)
+        elapsed, valid = asyncio.run(run_batch(args.count, concurrency, completion, args.timeout, args.retries))
+        print(f"{concurrency:>12} {elapsed:>10.3f} {valid:>8} {args.count / elapsed:>10.2f}")
+
+if __name__ == "__main__":
+    main()
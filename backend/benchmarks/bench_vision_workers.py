@@ -0,0 +1,70 @@
+"""
+Throughput and handoff latency of the multi-process vision pipeline with a
+synthetic camera, for several worker counts. No camera needed.
+
+    python benchmarks/bench_vision_workers.py --workers 1 2 4 --seconds 5
+    python benchmarks/bench_vision_workers.py --inference none     # pure shared-memory handoff
+    python benchmarks/bench_vision_workers.py --kill-worker         # check supervisor restarts
+"""
+import os
+import sys
+import time
+import signal
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+from vision_workers import VisionPool
+
+
+def run(workers, seconds, fps, inference, kill_worker):
+    pool = VisionPool(workers=workers, source="synthetic", fps=fps, inference=inference)
+    latencies = []
+    killed = False
+    try:
+        frames = pool.frames()
+        next(frames)  # wait for the workers to come up
+        started = time.monotonic()
+        delivered_before = pool.delivered
+        for frame, results, captured_at in frames:
+            # What the web process does with every frame
+            cv2.imencode('.jpg', frame)
+            latencies.append((time.monotonic() - captured_at) * 1000)
+            elapsed = time.monotonic() - started
+            if kill_worker and not killed and elapsed > seconds / 3:
+                os.kill(pool.inference_processes[0].pid, signal.SIGKILL)
+                killed = True
+            if elapsed >= seconds:
+                break
+        stats = pool.stats()
+        stats["fps"] = round((pool.delivered - delivered_before) / elapsed, 2)
+        frames.close()
+    finally:
+        pool.stop()
+
+    latencies.sort()
+    stats["latency_median_ms"] = round(statistics.median(latencies), 3)
+    stats["latency_p95_ms"] = round(latencies[int(len(latencies) * 0.95) - 1], 3)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--fps", type=float, default=60, help="Synthetic camera rate, 0 for as fast as possible")
+    parser.add_argument("--inference", choices=["mediapipe", "none"], default="mediapipe")
+    parser.add_argument("--kill-worker", action="store_true", help="Kill a worker a third of the way through")
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'fps':>8} {'handoff ms':>11} {'p50 ms':>8} {'p95 ms':>8} {'dropped':>8} {'stale':>6} {'restarts':>9}")
+    for workers in args.workers:
+        stats = run(workers, args.seconds, args.fps, args.inference, args.kill_worker)
+        print(f"{workers:>8} {stats['fps']:>8} {stats['handoff_ms']:>11} {stats['latency_median_ms']:>8} "
+              f"{stats['latency_p95_ms']:>8} {stats['dropped']:>8} {stats['stale']:>6} {stats['restarts']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+Micro-benchmarks for the backend hot paths, on synthetic inputs only
+(no camera, MIDI device, GPU or network needed).
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<earlier run>.json
+
+Each run is saved as JSON under benchmarks/results/. With --compare, the
+median of every benchmark is checked against the earlier run and the
+script exits with status 1 if any got slower than the threshold allows.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+results_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+
+# name -> function returning the callable to time
+benchmarks = {}
+
+
+def benchmark(name):
+    def register(setup):
+        benchmarks[name] = setup
+        return setup
+    return register
+
+
+def make_frame(seed=0):
+    """A synthetic BGR webcam frame: a smooth gradient with some sensor noise."""
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(0, 200, FRAME_WIDTH, dtype=np.float32)[None, :, None]
+    frame = np.broadcast_to(gradient, (FRAME_HEIGHT, FRAME_WIDTH, 3)).copy()
+    frame += rng.normal(0, 8, frame.shape)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def make_hand_results(frames=60, hands=2, seed=0):
+    """
+    Fake MediaPipe Hands results, built from the real landmark protobufs so
+    the drawing utilities accept them. Fingertips sweep across the piano keys
+    and move up and down so the drum triggers fire too.
+    """
+    from types import SimpleNamespace
+    from mediapipe.framework.formats import landmark_pb2, classification_pb2
+
+    rng = random.Random(seed)
+    sequence = []
+    for index in range(frames):
+        landmark_lists = []
+        handedness = []
+        for hand in range(hands):
+            base_x = 0.1 + 0.6 * ((index + hand * 15) % frames) / frames
+            base_y = 0.5 + 0.1 * ((index // 4) % 2)
+            landmark_list = landmark_pb2.NormalizedLandmarkList()
+            for point in range(21):
+                landmark = landmark_list.landmark.add()
+                landmark.x = base_x + 0.01 * (point % 5) + rng.uniform(-0.005, 0.005)
+                landmark.y = base_y - 0.01 * (point // 5) + rng.uniform(-0.005, 0.005)
+                landmark.z = rng.uniform(-0.1, 0.1)
+            landmark_lists.append(landmark_list)
+
+            classification_list = classification_pb2.ClassificationList()
+            classification = classification_list.classification.add()
+            classification.label = "Right" if hand == 0 else "Left"
+            classification.score = 0.99
+            handedness.append(classification_list)
+        sequence.append(SimpleNamespace(multi_hand_landmarks=landmark_lists, multi_handedness=handedness))
+    return sequence
+
+
+def make_recording(entries=10000, seed=0):
+    """A long synthetic piano recording in the format the frame loop records."""
+    rng = random.Random(seed)
+    names = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B", "C_High"]
+    recording = []
+    for _ in range(entries):
+        recording.append({
+            "notes": rng.sample(names, rng.choice([0, 1, 1, 1, 2, 3])),
+            "time_interval": rng.uniform(0.05, 2.2)
+        })
+    recording[-1]["time_interval"] = None
+    return recording
+
+
+def make_generated_notes(count=10000, seed=0):
+    rng = random.Random(seed)
+    notes = []
+    time_s = 0.0
+    for _ in range(count):
+        duration = rng.choice([0.25, 0.5, 0.75, 1.0])
+        notes.append({"time": time_s, "pitch": rng.randint(60, 72), "duration": duration, "velocity": rng.randint(60, 110)})
+        time_s += duration
+    return notes
+
+
+def cycle(items):
+    state = {"index": 0}
+
+    def next_item():
+        item = items[state["index"] % len(items)]
+        state["index"] += 1
+        return item
+    return next_item
+
+
+@benchmark("piano.process_hand_landmarks")
+def bench_piano_process():
+    import instruments.piano as piano
+    frame = make_frame()
+    next_results = cycle(make_hand_results())
+    hand_landmarks_data = []
+    return lambda: piano.process_hand_landmarks(next_results(), frame, hand_landmarks_data)
+
+
+@benchmark("drums.process_hand_landmarks")
+def bench_drums_process():
+    import instruments.drums as drums
+    frame = make_frame()
+    next_results = cycle(make_hand_results())
+    hand_landmarks_data = []
+    return lambda: drums.process_hand_landmarks(next_results(), frame, hand_landmarks_data)
+
+
+@benchmark("piano.draw_keys")
+def bench_piano_draw_keys():
+    import instruments.piano as piano
+    frame = make_frame()
+    return lambda: piano.draw_keys(frame)
+
+
+@benchmark("Create_Sheet_Music[10k entries]")
+def bench_create_sheet_music():
+    # server.Create_Sheet_Music is a thin wrapper; importing server would load the whole app
+    from notation import score_from_recording
+    recording = make_recording()
+    return lambda: score_from_recording(recording, title="Untitled Custom Composition")
+
+
+@benchmark("notation.score_from_generated[10k notes]")
+def bench_score_from_generated():
+    from notation import score_from_generated
+    notes = make_generated_notes()
+    return lambda: score_from_generated(notes)
+
+
+@benchmark("round_to_nearest_duration[scalar]")
+def bench_round_scalar():
+    from notation import round_to_nearest_duration
+    return lambda: round_to_nearest_duration(0.61)
+
+
+@benchmark("round_to_nearest_duration[10k array]")
+def bench_round_array():
+    from notation import round_to_nearest_duration
+    intervals = np.random.default_rng(0).uniform(0.05, 2.2, 10000)
+    return lambda: round_to_nearest_duration(intervals)
+
+
+@benchmark("AI_Utils.validate_notes[10k notes]")
+def bench_validate_notes():
+    from AI_Utils import validate_notes
+    notes = make_generated_notes()
+    return lambda: validate_notes(notes)
+
+
+@benchmark("landmark serialization[2 hands]")
+def bench_landmark_serialization():
+    results = make_hand_results(frames=1)[0]
+
+    def serialize():
+        hand_landmarks_data = [
+            [{"x": 1 - lm.x, "y": lm.y, "z": lm.z} for lm in hand_landmarks.landmark]
+            for hand_landmarks in results.multi_hand_landmarks
+        ]
+        return json.dumps({'hands': hand_landmarks_data})
+    return serialize
+
+
+@benchmark("cv2.imencode jpg[640x480]")
+def bench_jpeg_encode():
+    import cv2
+    frame = make_frame()
+    return lambda: cv2.imencode('.jpg', frame)
+
+
+def time_benchmark(function, min_time, repeat):
+    """Time `function`, returning per-call timings in microseconds for each repeat."""
+    function()  # warm up
+
+    # Pick a call count so one repeat lasts at least min_time
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed) + 1)
+
+    timings = [elapsed / number * 1e6]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - started) / number * 1e6)
+    return number, timings
+
+
+def run(selected, min_time, repeat):
+    results = {}
+    for name, setup in benchmarks.items():
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        try:
+            function = setup()
+        except Exception as e:
+            print(f"{name:<45} skipped ({type(e).__name__}: {e})")
+            results[name] = {"skipped": f"{type(e).__name__}: {e}"}
+            continue
+        number, timings = time_benchmark(function, min_time, repeat)
+        results[name] = {
+            "median_us": statistics.median(timings),
+            "min_us": min(timings),
+            "mean_us": statistics.fmean(timings),
+            "stdev_us": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            "number": number,
+            "repeat": repeat
+        }
+        print(f"{name:<45} {results[name]['median_us']:>14.2f} us  (min {results[name]['min_us']:.2f}, n={number}x{repeat})")
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    """Print the change against an earlier run. Returns the names that regressed."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+
+    regressions = []
+    print(f"\nCompared with {baseline_path} (threshold {threshold:.0%}):")
+    for name, result in results.items():
+        before = baseline.get(name, {})
+        if "median_us" not in result or "median_us" not in before:
+            continue
+        change = result["median_us"] / before["median_us"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif change < -threshold:
+            flag = "  improved"
+        print(f"{name:<45} {before['median_us']:>12.2f} -> {result['median_us']:>12.2f} us  {change:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("filter", nargs="*", help="Only run benchmarks whose name contains one of these")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per repeat")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Where to save the JSON results (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative slowdown flagged as a regression")
+    args = parser.parse_args()
+
+    results = run(args.filter, args.min_time, args.repeat)
+
+    output = args.output
+    if output is None:
+        os.makedirs(results_folder, exist_ok=True)
+        output = os.path.join(results_folder, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w") as f:
+        json.dump({
+            "createdAt": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "results": results
+        }, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import json
+import time
+import random
+import asyncio
+
+
+def make_stub_notes(count, rng):
+    """
+    Builds a random, valid note array in the format the model is asked for.
+    """
+    notes = []
+    time = 0.0
+    for _ in range(count):
+        duration = rng.choice([0.25, 0.5, 0.75, 1.0])
+        notes.append({
+            "time": round(time, 2),
+            "pitch": rng.randint(60, 72),
+            "duration": duration,
+            "velocity": rng.randint(60, 110)
+        })
+        time += duration
+    return notes
+
+def make_stub_completion(latency=0.5, jitter=0.0, failure_rate=0.0, note_count=32, seed=None):
+    """
+    Returns an async stand-in for AI_Utils.openai_completion that sleeps for the
+    injected latency (plus or minus jitter) and answers with a random note array.
+    A `failure_rate` fraction of calls raises, to exercise the retry path.
+    """
+    rng = random.Random(seed)
+
+    async def completion(messages):
+        await asyncio.sleep(max(0.0, latency + rng.uniform(-jitter, jitter)))
+        if rng.random() < failure_rate:
+            raise RuntimeError("Injected completion failure")
+        return json.dumps(make_stub_notes(note_count, rng))
+
+    return completion
+
+def make_stub_stream(first_token_latency=0.5, token_latency=0.02, chunk_size=4, note_count=32, seed=None):
+    """
+    Returns a stand-in for AI_Utils.stream_openai_completion that yields a
+    random note array (pretty-printed, like the model tends to) a few
+    characters at a time, sleeping between chunks to mimic token streaming.
+    """
+    rng = random.Random(seed)
+
+    def stream_completion(messages):
+        text = json.dumps(make_stub_notes(note_count, rng), indent=2)
+        time.sleep(first_token_latency)
+        for start in range(0, len(text), chunk_size):
+            if start:
+                time.sleep(token_latency)
+            yield text[start:start + chunk_size]
+
+    return stream_completion
@@ -0,0 +1,225 @@
+import math
+import time
+import threading
+from flask import request
+
+
+class ClientState:
+    """Delivery bookkeeping for one connected Socket.IO client."""
+
+    def __init__(self, sid):
+        self.sid = sid
+        self.subscriptions = {}  # event -> max messages per second (None for unlimited)
+        self.ack = set()         # events delivered with acknowledgement flow control
+        self.last_sent = {}      # event -> time of the last emit
+        self.last_seq = {}       # event -> sequence number of the last emit
+        self.in_flight = {}      # event -> time an unacknowledged emit was sent
+        self.sent = 0
+        self.dropped = 0
+
+
+class DeliveryScheduler:
+    """
+    Delivers frame-loop state to Socket.IO clients without blocking the frame loop.
+
+    publish() only stores the latest payload per event and wakes a dedicated
+    background worker, so at most one message per event is ever pending.
+    The worker emits to every subscribed client no faster than that client's
+    max rate; anything published in between is coalesced into the latest
+    state and counted as dropped for that client. Clients that subscribe with
+    `ack` get at most one unacknowledged message in flight per event.
+
+    Clients are subscribed to `default_events` when they connect, and can
+    send `subscribe` / `unsubscribe` to change events and rates (only events
+    the scheduler knows, see known_events()):
+
+        socket.emit("subscribe", {"events": ["hand_data"], "max_rate": 15, "ack": false})
+    """
+
+    def __init__(self, socketio, default_events=None, max_rate=30.0, ack_timeout=2.0):
+        self.socketio = socketio
+        self.default_events = dict(default_events or {})
+        self.max_rate = max_rate
+        self.ack_timeout = ack_timeout
+        self._lock = threading.Lock()
+        self._latest = {}    # event -> (seq, payload)
+        self._clients = {}
+        self._published = {}
+        self._wakeup = socketio.server.eio.create_event()
+        self._worker = None
+
+        socketio.on_event('connect', self._on_connect)
+        socketio.on_event('disconnect', self._on_disconnect)
+        socketio.on_event('subscribe', self._on_subscribe)
+        socketio.on_event('unsubscribe', self._on_unsubscribe)
+
+    def start(self):
+        """Start the delivery worker (once)."""
+        with self._lock:
+            if self._worker is None:
+                self._worker = self.socketio.start_background_task(self._run)
+
+    def publish(self, event, payload):
+        """Replace the pending state for an event. Never blocks on the network."""
+        with self._lock:
+            seq = self._latest.get(event, (0, None))[0] + 1
+            self._latest[event] = (seq, payload)
+            self._published[event] = self._published.get(event, 0) + 1
+        self._wakeup.set()
+
+    def subscribe(self, sid, events, max_rate=None, ack=False):
+        with self._lock:
+            client = self._clients.get(sid)
+            if client is None:
+                client = self._clients[sid] = ClientState(sid)
+            for event in events:
+                if event not in client.subscriptions:
+                    # Don't replay state published before the subscription, or
+                    # count what was published while unsubscribed as dropped
+                    client.last_seq[event] = self._latest.get(event, (0, None))[0]
+                client.subscriptions[event] = max_rate
+                if ack:
+                    client.ack.add(event)
+                else:
+                    client.ack.discard(event)
+                    client.in_flight.pop(event, None)
+        # A new rate or flow control mode can make a delivery due right away
+        self._wakeup.set()
+
+    def unsubscribe(self, sid, events=None):
+        with self._lock:
+            client = self._clients.get(sid)
+            if client is None:
+                return
+            for event in list(events or client.subscriptions):
+                client.subscriptions.pop(event, None)
+                client.ack.discard(event)
+                client.in_flight.pop(event, None)
+
+    def _on_connect(self, auth=None):
+        for event, max_rate in self.default_events.items():
+            self.subscribe(request.sid, [event], max_rate)
+
+    def _on_disconnect(self, *args):
+        with self._lock:
+            self._clients.pop(request.sid, None)
+
+    def known_events(self):
+        """Events clients may subscribe to: the default ones and anything published so far."""
+        with self._lock:
+            return set(self.default_events) | set(self._latest)
+
+    def _on_subscribe(self, data):
+        data = data if isinstance(data, dict) else {}
+        events = data.get('events') or list(self.default_events)
+        if not isinstance(events, list) or not all(isinstance(event, str) for event in events):
+            return {"status": "error", "message": "events must be a list of event names"}
+        unknown = sorted(set(events) - self.known_events())
+        if unknown:
+            return {"status": "error", "message": f"Unknown events: {', '.join(unknown)}"}
+
+        max_rate = data.get('max_rate')
+        if max_rate is not None:
+            try:
+                max_rate = float(max_rate)
+            except (TypeError, ValueError):
+                max_rate = math.nan
+            if not math.isfinite(max_rate) or max_rate <= 0:
+                return {"status": "error", "message": "max_rate must be a positive number"}
+            max_rate = max(0.1, max_rate)
+        self.subscribe(request.sid, events, max_rate, bool(data.get('ack')))
+        return {"status": "success", "events": events, "max_rate": max_rate}
+
+    def _on_unsubscribe(self, data=None):
+        events = data.get('events') if isinstance(data, dict) else None
+        if events is not None and (not isinstance(events, list) or not all(isinstance(event, str) for event in events)):
+            return {"status": "error", "message": "events must be a list of event names"}
+        self.unsubscribe(request.sid, events)
+
+    def _acknowledged(self, sid, event):
+        def callback(*args):
+            with self._lock:
+                client = self._clients.get(sid)
+                if client is not None:
+                    client.in_flight.pop(event, None)
+            self._wakeup.set()
+        return callback
+
+    def _collect(self, now):
+        """
+        Pick the (client, event, payload) deliveries that are due.
+        Returns them with the seconds until the next rate-limited one is due.
+        """
+        due = []
+        next_due = None
+        with self._lock:
+            for client in self._clients.values():
+                for event, max_rate in client.subscriptions.items():
+                    seq, payload = self._latest.get(event, (0, None))
+                    last_seq = client.last_seq.get(event, 0)
+                    if seq <= last_seq:
+                        continue
+                    sent_at = client.in_flight.get(event)
+                    if sent_at is not None:
+                        if now - sent_at < self.ack_timeout:
+                            continue
+                        client.in_flight.pop(event)
+                    # self.max_rate caps every client (the load governor lowers it under load)
+                    rate = min(max_rate, self.max_rate) if max_rate and self.max_rate else max_rate or self.max_rate
+                    wait = client.last_sent.get(event, 0.0) + 1.0 / rate - now if rate else 0.0
+                    if wait > 0:
+                        next_due = wait if next_due is None else min(next_due, wait)
+                        continue
+                    client.dropped += seq - last_seq - 1
+                    client.sent += 1
+                    client.last_seq[event] = seq
+                    client.last_sent[event] = now
+                    if event in client.ack:
+                        client.in_flight[event] = now
+                    due.append((client.sid, event, payload, event in client.ack))
+        return due, next_due
+
+    def _run(self):
+        while True:
+            # Cleared before collecting so a publish() during the emits wakes the next wait
+            self._wakeup.clear()
+            due, next_due = self._collect(time.monotonic())
+            for sid, event, payload, ack in due:
+                try:
+                    if ack:
+                        self.socketio.emit(event, payload, to=sid, callback=self._acknowledged(sid, event))
+                    else:
+                        self.socketio.emit(event, payload, to=sid)
+                except Exception as e:
+                    print(f"Error delivering {event} to {sid}: {e}")
+            if not due:
+                self._wakeup.wait(timeout=next_due if next_due is not None else self.ack_timeout)
+
+    def stats(self):
+        """Queue depth (pending client deliveries), drop and send counters."""
+        with self._lock:
+            queue_depth = 0
+            in_flight = 0
+            clients = []
+            for client in self._clients.values():
+                pending = sum(
+                    1 for event in client.subscriptions
+                    if self._latest.get(event, (0, None))[0] > client.last_seq.get(event, 0)
+                )
+                queue_depth += pending
+                in_flight += len(client.in_flight)
+                clients.append({
+                    "sid": client.sid,
+                    "subscriptions": dict(client.subscriptions),
+                    "pending": pending,
+                    "sent": client.sent,
+                    "dropped": client.dropped
+                })
+            return {
+                "queue_depth": queue_depth,
+                "in_flight": in_flight,
+                "published": dict(self._published),
+                "sent": sum(client["sent"] for client in clients),
+                "dropped": sum(client["dropped"] for client in clients),
+                "clients": clients
+            }
@@ -0,0 +1,103 @@
+import threading
+
+# Quality levels, best first. Work that doesn't affect note triggering (emit
+# rate, JPEG quality, landmark overlay) is given up before the hand tracking
+# itself (inference resolution, then model complexity).
+QUALITY_LEVELS = [
+    {"name": "full", "model_complexity": 1, "inference_scale": 1.0, "draw_landmarks": True, "jpeg_quality": 95, "emit_rate": 30},
+    {"name": "reduced-delivery", "model_complexity": 1, "inference_scale": 1.0, "draw_landmarks": True, "jpeg_quality": 80, "emit_rate": 15},
+    {"name": "reduced-overlay", "model_complexity": 1, "inference_scale": 1.0, "draw_landmarks": False, "jpeg_quality": 65, "emit_rate": 10},
+    {"name": "reduced-inference", "model_complexity": 1, "inference_scale": 0.75, "draw_landmarks": False, "jpeg_quality": 60, "emit_rate": 10},
+    {"name": "minimal", "model_complexity": 0, "inference_scale": 0.5, "draw_landmarks": False, "jpeg_quality": 50, "emit_rate": 5},
+]
+
+
+class LoadGovernor:
+    """
+    Trades output quality for frame time.
+
+    The frame loop reports, per frame, how long it took until the instrument
+    had triggered its notes and how long the whole frame took. Both are
+    smoothed; when either exceeds its budget for `degrade_after` frames the
+    governor steps one quality level down, and when both have plenty of
+    headroom for `restore_after` frames it steps back up. Note triggering has
+    its own, tighter budget, and going over it skips straight to the next
+    level that makes hand tracking cheaper.
+    """
+
+    def __init__(self, frame_budget_ms=33.0, trigger_budget_ms=20.0, levels=QUALITY_LEVELS,
+                 smoothing=0.1, headroom=0.7, degrade_after=15, restore_after=90):
+        self.frame_budget_ms = frame_budget_ms
+        self.trigger_budget_ms = trigger_budget_ms
+        self.levels = levels
+        self.smoothing = smoothing
+        self.headroom = headroom
+        self.degrade_after = degrade_after
+        self.restore_after = restore_after
+        self.level = 0
+        self.frame_ms = None
+        self.trigger_ms = None
+        self.changes = 0
+        self._over = 0
+        self._under = 0
+        self._lock = threading.Lock()
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    def record(self, trigger_ms, frame_ms):
+        """Record one frame's timings. Returns the settings to use for the next frame."""
+        with self._lock:
+            if self.frame_ms is None:
+                self.frame_ms, self.trigger_ms = frame_ms, trigger_ms
+            else:
+                self.frame_ms += self.smoothing * (frame_ms - self.frame_ms)
+                self.trigger_ms += self.smoothing * (trigger_ms - self.trigger_ms)
+
+            trigger_over = self.trigger_ms > self.trigger_budget_ms
+            over = trigger_over or self.frame_ms > self.frame_budget_ms
+            under = (self.frame_ms < self.frame_budget_ms * self.headroom
+                     and self.trigger_ms < self.trigger_budget_ms * self.headroom)
+            self._over = self._over + 1 if over else 0
+            self._under = self._under + 1 if under else 0
+
+            if self._over >= self.degrade_after and self.level < len(self.levels) - 1:
+                self._set_level(self._inference_level() if trigger_over else self.level + 1)
+            elif self._under >= self.restore_after and self.level > 0:
+                self._set_level(self.level - 1)
+            return self.levels[self.level]
+
+    def _inference_level(self):
+        """
+        The next level that makes hand tracking itself cheaper. When note
+        triggering is over budget, cutting delivery or overlay work won't help.
+        """
+        current = self.levels[self.level]
+        for level in range(self.level + 1, len(self.levels)):
+            settings = self.levels[level]
+            if (settings["inference_scale"] < current["inference_scale"]
+                    or settings["model_complexity"] < current["model_complexity"]):
+                return level
+        return len(self.levels) - 1
+
+    def _set_level(self, level):
+        print(f"Load governor: {self.levels[self.level]['name']} -> {self.levels[level]['name']} "
+              f"(frame {self.frame_ms:.1f}ms, trigger {self.trigger_ms:.1f}ms)")
+        self.level = level
+        self.changes += 1
+        self._over = 0
+        self._under = 0
+
+    def state(self):
+        with self._lock:
+            return {
+                "level": self.level,
+                "levels": len(self.levels),
+                "settings": dict(self.levels[self.level]),
+                "frame_ms": round(self.frame_ms, 2) if self.frame_ms is not None else None,
+                "trigger_ms": round(self.trigger_ms, 2) if self.trigger_ms is not None else None,
+                "frame_budget_ms": self.frame_budget_ms,
+                "trigger_budget_ms": self.trigger_budget_ms,
+                "changes": self.changes
+            }
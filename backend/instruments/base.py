@@ -0,0 +1,33 @@
+class Instrument:
+    """
+    Common interface for instruments driven by MediaPipe hand landmarks.
+
+    Subclasses declare the audio/MIDI resources they hold in `resources`,
+    acquire them in setup() and release them in teardown().
+    """
+    name = None
+    resources = ()
+    records_notes = False
+
+    def __init__(self):
+        self.is_setup = False
+        # Lowered by the load governor to skip drawing the hand skeleton
+        self.draw_landmarks = True
+
+    def setup(self):
+        """Acquire the audio/MIDI resources this instrument needs."""
+        self.is_setup = True
+
+    def draw(self, frame):
+        """Draw the instrument overlay onto the frame."""
+
+    def process(self, results, frame, hand_landmarks_data):
+        """
+        Handle the hand landmarks of one frame.
+        Returns the list of notes currently held.
+        """
+        return []
+
+    def teardown(self):
+        """Release every resource acquired in setup()."""
+        self.is_setup = False
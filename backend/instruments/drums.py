@@ -1,8 +1,14 @@
+import os
 import mediapipe as mp
 import numpy as np
-import sounddevice as sd
 from scipy.io import wavfile
 import cv2
+from instruments.base import Instrument
+
+mp_hands = mp.solutions.hands
+mp_drawing = mp.solutions.drawing_utils
+
+sounds_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sounds")
 
 class DrumSampler:
     def __init__(self, sample_path, hand_type):
@@ -21,24 +27,37 @@ class DrumSampler:
         # Hand type setup (right or left)
         self.hand_type = hand_type  # 'right' or 'left'
         
-        # Hand tracking setup
-        self.mp_hands = mp.solutions.hands
-        self.hands = self.mp_hands.Hands(min_detection_confidence=0.7)
-        self.mp_draw = mp.solutions.drawing_utils
-        
-        # Audio stream
-        self.stream = sd.OutputStream(
-            samplerate=self.sample_rate,
-            channels=1,
-            callback=self.audio_callback,
-            blocksize=self.buffer_size
-        )
-        self.stream.start()
+        # Audio stream, opened by open() when the drums are activated
+        self.stream = None
         self.prev_y = None
         self.velocity_threshold = 15  # Adjust for sensitivity
         self.allow_trigger = True  # Allow trigger when conditions are met
 
 
+    def open(self):
+        """Open and start the audio output stream."""
+        if self.stream is None:
+            # Imported here so the drums can be loaded on machines without PortAudio
+            import sounddevice as sd
+            self.stream = sd.OutputStream(
+                samplerate=self.sample_rate,
+                channels=1,
+                callback=self.audio_callback,
+                blocksize=self.buffer_size
+            )
+            self.stream.start()
+
+    def close(self):
+        """Stop and release the audio output stream."""
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+        self.is_playing = False
+        self.position = 0
+        self.prev_y = None
+        self.allow_trigger = True
+
     def audio_callback(self, outdata, frames, time, status):
         if self.is_playing:
             if self.position >= len(self.sample):
@@ -74,10 +93,10 @@ class DrumSampler:
         self.is_playing = True
 
 
-kick = DrumSampler("sounds/Electronic-Kick-1.wav", "right")
-snare = DrumSampler("sounds/Ensoniq-ESQ-1-Snare.wav", "left")
+kick = DrumSampler(os.path.join(sounds_folder, "Electronic-Kick-1.wav"), "right")
+snare = DrumSampler(os.path.join(sounds_folder, "Ensoniq-ESQ-1-Snare.wav"), "left")
 
-def process_hand_landmarks(results, frame, hand_landmarks_data):
+def process_hand_landmarks(results, frame, hand_landmarks_data, draw_landmarks=True):
     hand_landmarks_data.clear()
     
     if results.multi_hand_landmarks:
@@ -86,8 +105,9 @@ def process_hand_landmarks(results, frame, hand_landmarks_data):
             hand_label = results.multi_handedness[idx].classification[0].label
             
             # Draw hand landmarks
-            kick.mp_draw.draw_landmarks(frame, hand_landmarks, 
-                                     kick.mp_hands.HAND_CONNECTIONS)
+            if draw_landmarks:
+                mp_drawing.draw_landmarks(frame, hand_landmarks, 
+                                         mp_hands.HAND_CONNECTIONS)
             hand_landmarks_data.append([
             {"x": 1- lm.x, "y": lm.y, "z": lm.z}
             for lm in hand_landmarks.landmark
@@ -130,3 +150,22 @@ def process_hand_landmarks(results, frame, hand_landmarks_data):
                         snare.allow_trigger = True
 
                 snare.prev_y = y
+
+
+class Drums(Instrument):
+    name = "drums"
+    resources = ("audio_out",)
+
+    def setup(self):
+        kick.open()
+        snare.open()
+        super().setup()
+
+    def process(self, results, frame, hand_landmarks_data):
+        process_hand_landmarks(results, frame, hand_landmarks_data, self.draw_landmarks)
+        return []
+
+    def teardown(self):
+        kick.close()
+        snare.close()
+        super().teardown()
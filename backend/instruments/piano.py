@@ -2,12 +2,13 @@ import cv2
 import mediapipe as mp
 import numpy as np
 import pygame.midi
+from instruments.base import Instrument
 
 mp_hands = mp.solutions.hands
 mp_drawing = mp.solutions.drawing_utils
 
-pygame.midi.init()
-midi_out = pygame.midi.Output(pygame.midi.get_default_output_id())
+# Opened by open_midi() when the piano is activated
+midi_out = None
 
 # MIDI note numbers for a single octave
 midi_note_numbers = {
@@ -71,13 +72,14 @@ def draw_keys(frame):
             cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 0, 0), thickness=2)
 
 
-def process_hand_landmarks(results, frame, hand_landmarks_data):
+def process_hand_landmarks(results, frame, hand_landmarks_data, draw_landmarks=True):
     keys_with_fingers = set()
     hand_landmarks_data.clear()
 
     if results.multi_hand_landmarks:
         for hand_landmarks in results.multi_hand_landmarks:
-            mp_drawing.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
+            if draw_landmarks:
+                mp_drawing.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
 
             # Extract and store hand landmarks for /hand-data endpoint
             hand_landmarks_data.append([
@@ -114,11 +116,54 @@ def process_hand_landmarks(results, frame, hand_landmarks_data):
 def play_midi(note):
     """Play a MIDI note and record it."""
     if note in midi_note_numbers and note not in active_notes:
-        midi_out.note_on(midi_note_numbers[note], velocity=100)
+        if midi_out is not None:
+            midi_out.note_on(midi_note_numbers[note], velocity=100)
         active_notes.append(note)
 
 def stop_midi(note):
     """Stop a MIDI note."""
     if note in midi_note_numbers and note in active_notes:
-        midi_out.note_off(midi_note_numbers[note], velocity=100)
-        active_notes.remove(note)
\ No newline at end of file
+        if midi_out is not None:
+            midi_out.note_off(midi_note_numbers[note], velocity=100)
+        active_notes.remove(note)
+
+def open_midi():
+    """Open the default MIDI output port. Without one the piano still runs, silently."""
+    global midi_out
+    if midi_out is None:
+        pygame.midi.init()
+        try:
+            midi_out = pygame.midi.Output(pygame.midi.get_default_output_id())
+        except Exception as e:
+            print(f"No MIDI output available, the piano will be silent: {e}")
+            pygame.midi.quit()
+
+def close_midi():
+    """Stop any held notes and release the MIDI output port."""
+    global midi_out
+    for note in list(active_notes):
+        stop_midi(note)
+    if midi_out is not None:
+        midi_out.close()
+        midi_out = None
+        pygame.midi.quit()
+
+
+class Piano(Instrument):
+    name = "piano"
+    resources = ("midi_out",)
+    records_notes = True
+
+    def setup(self):
+        open_midi()
+        super().setup()
+
+    def draw(self, frame):
+        draw_keys(frame)
+
+    def process(self, results, frame, hand_landmarks_data):
+        return process_hand_landmarks(results, frame, hand_landmarks_data, self.draw_landmarks)
+
+    def teardown(self):
+        close_midi()
+        super().teardown()
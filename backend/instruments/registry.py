@@ -0,0 +1,146 @@
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class InstrumentRegistry:
+    """
+    Keeps track of the available instrument plugins.
+
+    Instruments are imported and constructed in a background thread
+    (preload), their resources are acquired off the frame loop, and the
+    frame loop picks up the new instance between two frames by calling
+    current(). The previous instrument is torn down once the frame loop
+    has moved past it.
+    """
+
+    def __init__(self, max_workers=2):
+        self._plugins = {}
+        self._instances = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+        # Serialises setup()/teardown() so a release never races a re-activation
+        self._resource_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="instrument")
+        # Imports run on their own pool: _prepare() waits on them from _executor,
+        # so sharing one pool could leave every worker waiting on a queued import
+        self._loader = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="instrument-load")
+        self._active = None
+        self._pending = None
+
+    def register(self, name, target):
+        """Register an instrument as 'module.path:ClassName' under the given name."""
+        self._plugins[name] = target
+
+    def names(self):
+        return list(self._plugins)
+
+    def _load(self, name):
+        module_path, class_name = self._plugins[name].split(":")
+        module = importlib.import_module(module_path)
+        instance = getattr(module, class_name)()
+        print(f"Preloaded instrument: {name}")
+        return instance
+
+    def preload(self, name):
+        """Import and construct an instrument in the background. Returns a future."""
+        with self._lock:
+            future = self._loading.get(name)
+            if future is not None:
+                return future
+            future = self._loader.submit(self._load, name)
+            self._loading[name] = future
+        # Outside the lock: the callback runs right away if the future is already done
+        future.add_done_callback(lambda done: self._loaded(name, done))
+        return future
+
+    def _loaded(self, name, future):
+        """Log a failed import/construction and forget it, so the next preload retries."""
+        error = future.exception()
+        if error is None:
+            return
+        print(f"Error loading instrument '{name}': {error}")
+        with self._lock:
+            if self._loading.get(name) is future:
+                del self._loading[name]
+
+    def preload_all(self):
+        return [self.preload(name) for name in self._plugins]
+
+    def _prepare(self, name):
+        instance = self.preload(name).result()
+        with self._resource_lock:
+            if not instance.is_setup:
+                try:
+                    instance.setup()
+                except Exception:
+                    # Release whatever setup() managed to acquire before failing
+                    instance.teardown()
+                    raise
+            with self._lock:
+                self._instances[name] = instance
+                replaced, self._pending = self._pending, instance
+        # An instrument that was set up but never swapped in still holds its resources
+        if replaced is not None and replaced is not instance:
+            self._executor.submit(self._release, replaced)
+        print(f"Loaded instrument: {name}")
+        return instance
+
+    def activate(self, name):
+        """
+        Schedule a switch to the named instrument.
+        Returns a future resolving to the instance once it is ready to be
+        swapped in; it raises if the import or setup() failed.
+        """
+        if name not in self._plugins:
+            raise KeyError(name)
+        future = self._executor.submit(self._prepare, name)
+        future.add_done_callback(lambda done: self._activated(name, done))
+        return future
+
+    def _activated(self, name, future):
+        error = future.exception()
+        if error is not None:
+            print(f"Error activating instrument '{name}': {error}")
+
+    def current(self):
+        """
+        Return the instrument to use for this frame.
+        Called once per frame from the frame loop; swaps in a pending
+        instrument and releases the one it replaces.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, None
+            if pending is None or pending is self._active:
+                return self._active
+            previous, self._active = self._active, pending
+        if previous is not None:
+            self._executor.submit(self._release, previous)
+        return pending
+
+    def _release(self, instance):
+        with self._resource_lock:
+            with self._lock:
+                # The instrument may have been re-activated while it was queued for release
+                if instance is self._active or instance is self._pending:
+                    return
+            instance.teardown()
+        print(f"Released instrument: {instance.name}")
+
+    @property
+    def active_name(self):
+        with self._lock:
+            instance = self._pending or self._active
+        return instance.name if instance is not None else None
+
+    def shutdown(self):
+        """Tear down every instrument that still holds resources."""
+        with self._lock:
+            instances = list(self._instances.values())
+            self._active = self._pending = None
+        with self._resource_lock:
+            for instance in instances:
+                if instance.is_setup:
+                    instance.teardown()
+        self._executor.shutdown(wait=False)
+        self._loader.shutdown(wait=False)
@@ -0,0 +1,246 @@
+import numpy as np
+from music21 import stream, note, chord, pitch, tempo, meter, metadata, tie
+
+# Map piano key names to MIDI pitches
+note_midi_numbers = {
+    "C": 60, "C#": 61, "D": 62, "D#": 63, "E": 64, "F": 65, "F#": 66,
+    "G": 67, "G#": 68, "A": 69, "A#": 70, "B": 71, "C_High": 72
+}
+
+# Standard note lengths in seconds at 120 BPM (a quarter note lasts 0.5s):
+# eighth, quarter, dotted quarter, half, dotted half, whole
+note_durations = np.array([0.25, 0.5, 0.75, 1.0, 1.5, 2.0])
+
+TIE_KINDS = np.array(["start", "continue", "stop"])
+
+# Spelled pitch names by MIDI number. Building chords from names instead of
+# integers skips music21's per-chord enharmonic search, which dominates build time.
+pitch_names = [pitch.Pitch(midi=midi).nameWithOctave for midi in range(128)]
+
+
+def round_to_nearest_duration(time_interval):
+    """
+    Snap time intervals (in seconds) to the closest standard note length.
+    Accepts a single value or an array.
+    """
+    intervals = np.asarray(time_interval, dtype=float)
+    closest = np.abs(intervals[..., None] - note_durations).argmin(axis=-1)
+    rounded = note_durations[closest]
+    return float(rounded) if rounded.ndim == 0 else rounded
+
+
+def _recorded_lengths(recorded_notes, min_interval):
+    """
+    Indexes of the kept recorded entries and their lengths in seconds, snapped
+    to standard note lengths. Entries are laid end to end, like the recording
+    was played, so onsets and lengths always agree.
+    """
+    intervals = np.array(
+        [entry.get("time_interval") for entry in recorded_notes], dtype=float
+    ).reshape(-1)
+    keep = np.flatnonzero(~np.isnan(intervals) & (intervals >= min_interval))
+    return keep, round_to_nearest_duration(intervals[keep]).reshape(-1)
+
+
+def arrays_from_recording(recorded_notes, min_interval=0.2):
+    """
+    Convert recorded piano entries ({'notes': [...], 'time_interval': seconds})
+    to note arrays (onset, duration, pitch, velocity), onset and duration in seconds.
+    Entries shorter than `min_interval` or still held (no interval) are dropped;
+    entries without notes only advance time and end up as rests (see
+    recording_length for the full time span, trailing rests included).
+    """
+    keep, lengths = _recorded_lengths(recorded_notes, min_interval)
+    onsets = np.cumsum(lengths) - lengths
+
+    pitch_lists = [
+        [note_midi_numbers[name] for name in recorded_notes[i].get("notes", []) if name in note_midi_numbers]
+        for i in keep
+    ]
+    counts = np.array([len(pitches) for pitches in pitch_lists], dtype=np.int64)
+    pitches = np.fromiter((p for pitches in pitch_lists for p in pitches), dtype=np.int64, count=counts.sum())
+
+    return (
+        np.repeat(onsets, counts),
+        np.repeat(lengths, counts),
+        pitches,
+        np.full(len(pitches), 100, dtype=np.int64)
+    )
+
+
+def recording_length(recorded_notes, min_interval=0.2):
+    """
+    Seconds from the start of a recording to the end of its last kept entry,
+    notes or rest, matching the onsets of arrays_from_recording.
+    """
+    return float(_recorded_lengths(recorded_notes, min_interval)[1].sum())
+
+
+def arrays_from_generated(notes):
+    """
+    Convert generated note dictionaries (time, pitch, duration, velocity) to note arrays.
+    """
+    values = np.array(
+        [(n["time"], n["duration"], n["pitch"], n["velocity"]) for n in notes], dtype=float
+    ).reshape(-1, 4)
+    return values[:, 0], values[:, 1], values[:, 2].astype(np.int64), values[:, 3].astype(np.int64)
+
+
+def quantize(onsets, durations, bpm=120, grid=0.5):
+    """
+    Quantize onsets and durations in seconds to a tempo grid.
+    Returns integer grid units (one unit is `grid` quarter notes); every
+    note lasts at least one unit.
+    """
+    units_per_second = bpm / 60.0 / grid
+    onset_units = np.rint(np.asarray(onsets, dtype=float) * units_per_second).astype(np.int64)
+    duration_units = np.maximum(
+        np.rint(np.asarray(durations, dtype=float) * units_per_second).astype(np.int64), 1
+    )
+    return onset_units, duration_units
+
+
+def layout_events(onset_units, duration_units, pitches, velocities, measure_units, min_units=0):
+    """
+    Lay quantized notes out as a single voice of measures.
+
+    Notes starting together become one chord, held for the longest of them but
+    cut at the next onset. Gaps become rests, rests run on to `min_units` if the
+    notes end earlier, the last measure is padded with a rest, and anything
+    crossing a barline is split into tied pieces.
+
+    Returns (pieces, chord_pitches, chord_velocities). `pieces` is a dict of
+    per-piece arrays: measure, start and end (grid units), chord (index into
+    chord_pitches, -1 for rests) and tie (index into TIE_KINDS, -1 for none).
+    """
+    order = np.lexsort((pitches, onset_units))
+    onset_units = onset_units[order]
+    duration_units = duration_units[order]
+    pitches = pitches[order]
+    velocities = velocities[order]
+
+    # Group simultaneous notes into chords, dropping repeated pitches
+    unique = np.r_[True, (onset_units[1:] != onset_units[:-1]) | (pitches[1:] != pitches[:-1])]
+    chord_starts = np.flatnonzero(np.r_[True, onset_units[1:] != onset_units[:-1]])
+    chord_onsets = onset_units[chord_starts]
+    chord_lengths = np.maximum.reduceat(duration_units, chord_starts)
+    chord_velocities = np.maximum.reduceat(velocities, chord_starts)
+    chord_pitches = [group[keep] for group, keep in zip(
+        np.split(pitches, chord_starts[1:]), np.split(unique, chord_starts[1:])
+    )]
+
+    notes_end = chord_onsets[-1] + chord_lengths[-1]
+    next_onsets = np.r_[chord_onsets[1:], notes_end]
+    chord_lengths = np.minimum(chord_lengths, next_onsets - chord_onsets)
+    end = max(notes_end, min_units)
+
+    # Rests fill the gaps before, between and after the chords
+    total = -(-end // measure_units) * measure_units
+    rest_starts = np.r_[0, chord_onsets + chord_lengths]
+    rest_ends = np.r_[chord_onsets[0], next_onsets[:-1], total]
+    has_rest = rest_ends > rest_starts
+
+    event_starts = np.r_[chord_onsets, rest_starts[has_rest]]
+    event_ends = np.r_[chord_onsets + chord_lengths, rest_ends[has_rest]]
+    event_chords = np.r_[np.arange(len(chord_onsets)), np.full(has_rest.sum(), -1)]
+    order = np.argsort(event_starts, kind="stable")
+    event_starts, event_ends, event_chords = event_starts[order], event_ends[order], event_chords[order]
+
+    # Split events across barlines
+    first_measure = event_starts // measure_units
+    piece_counts = (event_ends - 1) // measure_units - first_measure + 1
+    event_index = np.repeat(np.arange(len(event_starts)), piece_counts)
+    piece_number = np.arange(len(event_index)) - np.repeat(np.cumsum(piece_counts) - piece_counts, piece_counts)
+    measures = first_measure[event_index] + piece_number
+    counts = piece_counts[event_index]
+    chords = event_chords[event_index]
+
+    ties = np.where(piece_number == 0, 0, np.where(piece_number == counts - 1, 2, 1))
+    ties[(counts == 1) | (chords < 0)] = -1
+
+    pieces = {
+        "measure": measures,
+        "start": np.maximum(event_starts[event_index], measures * measure_units),
+        "end": np.minimum(event_ends[event_index], (measures + 1) * measure_units),
+        "chord": chords,
+        "tie": ties
+    }
+    return pieces, chord_pitches, chord_velocities
+
+
+def score_from_arrays(onsets, durations, pitches, velocities, title, bpm=120, time_signature="4/4", grid=0.5,
+                      length=0.0):
+    """
+    Build a music21 score from note arrays (onset and duration in seconds,
+    MIDI pitch, velocity). Quantization and layout are done in NumPy, and
+    the music21 objects are inserted in bulk rather than appended one by one.
+    The score is filled with rests up to `length` seconds if the notes end earlier.
+    Raises ValueError for negative onsets.
+    """
+    if len(onsets) and np.min(onsets) < 0:
+        raise ValueError("Note onsets must not be negative")
+    time_sig = meter.TimeSignature(time_signature)
+    measure_units = int(round(time_sig.barDuration.quarterLength / grid))
+
+    score = stream.Score()
+    score.metadata = metadata.Metadata()
+    score.metadata.title = title
+    part = stream.Part()
+
+    measures = [stream.Measure(number=1)]
+    measures[0].coreInsert(0, tempo.MetronomeMark(number=bpm))
+    measures[0].coreInsert(0, time_sig)
+
+    length_units = int(quantize([length], [0.0], bpm, grid)[0][0])
+    if len(pitches):
+        onset_units, duration_units = quantize(onsets, durations, bpm, grid)
+        pieces, chord_pitches, chord_velocities = layout_events(
+            onset_units, duration_units, np.asarray(pitches, dtype=np.int64),
+            np.asarray(velocities, dtype=np.int64), measure_units, length_units
+        )
+        for number in range(2, int(pieces["measure"][-1]) + 2):
+            measures.append(stream.Measure(number=number))
+
+        quarter_lengths = ((pieces["end"] - pieces["start"]) * grid).tolist()
+        offsets = ((pieces["start"] - pieces["measure"] * measure_units) * grid).tolist()
+        for measure, offset, quarter_length, chord_index, tie_index in zip(
+            pieces["measure"].tolist(), offsets, quarter_lengths, pieces["chord"].tolist(), pieces["tie"].tolist()
+        ):
+            if chord_index < 0:
+                element = note.Rest(quarterLength=quarter_length)
+            else:
+                chord_pitch = [pitch_names[midi] for midi in chord_pitches[chord_index].tolist()]
+                if len(chord_pitch) == 1:
+                    element = note.Note(chord_pitch[0], quarterLength=quarter_length)
+                else:
+                    element = chord.Chord(chord_pitch, quarterLength=quarter_length)
+                element.volume.velocity = int(chord_velocities[chord_index])
+                if tie_index >= 0:
+                    element.tie = tie.Tie(TIE_KINDS[tie_index])
+            measures[measure].coreInsert(offset, element)
+    elif length_units > 0:
+        # Only rests: whole-measure rests covering the length
+        for number in range(2, -(-length_units // measure_units) + 1):
+            measures.append(stream.Measure(number=number))
+        for measure in measures:
+            measure.coreInsert(0, note.Rest(quarterLength=measure_units * grid))
+
+    bar_length = measure_units * grid
+    for index, measure in enumerate(measures):
+        measure.coreElementsChanged()
+        part.coreInsert(index * bar_length, measure)
+    part.coreElementsChanged()
+    score.coreInsert(0, part)
+    score.coreElementsChanged()
+    return score
+
+
+def score_from_recording(recorded_notes, title="Untitled Custom Composition", **kwargs):
+    """Build a score from a recorded piano session, rests at the end included."""
+    kwargs.setdefault("length", recording_length(recorded_notes))
+    return score_from_arrays(*arrays_from_recording(recorded_notes), title, **kwargs)
+
+
+def score_from_generated(notes, title="AI powered notes", **kwargs):
+    """Build a score from AI generated note dictionaries."""
+    return score_from_arrays(*arrays_from_generated(notes), title, **kwargs)
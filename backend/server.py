@@ -3,16 +3,23 @@ import cv2
 import mediapipe as mp
 from flask import Flask, jsonify, Response, request, send_from_directory
 from flask_cors import CORS
-from diffusers import StableDiffusionPipeline
-import torch
 import os
-import importlib
+import json
+import atexit
+from contextlib import closing
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from flask_socketio import SocketIO
-import instruments.drums as drums
-import instruments.piano as piano
-from music21 import stream, note, chord, tempo, meter, metadata, converter, midi
+from instruments.registry import InstrumentRegistry
+from delivery import DeliveryScheduler
+from governor import LoadGovernor
+from vision_workers import VisionPool
+from music21 import converter, midi
+from notation import score_from_recording, score_from_generated
+from synth import render_sheet_music, AUDIO_FORMATS
+from album_cover import generate_abstract_album_cover
 import time
-from AI_Utils import generate_notes_from_instructions
+from AI_Utils import generate_notes_from_instructions, validate_notes, iter_batch, create_sheet_music_from_notes, stream_notes_from_instructions
 import subprocess
 from dotenv import load_dotenv
 
@@ -24,19 +31,44 @@ app = Flask(__name__)
 CORS(app)
 socketio = SocketIO(app, cors_allowed_origins="*")
 
+# Frame loop state is published here and emitted by a background worker,
+# rate limited per client (clients get these events on connect)
+delivery = DeliveryScheduler(socketio, default_events={'hand_data': None, 'recent_key': None})
+delivery.start()
+
 # Initialize MediaPipe Hands
 mp_hands = mp.solutions.hands
 mp_drawing = mp.solutions.drawing_utils
-hands = mp_hands.Hands(min_detection_confidence= 0.6, min_tracking_confidence= 0.5)
+# Capture and hand tracking run in worker processes when VISION_WORKERS > 0,
+# handing frames over through shared memory; otherwise they run in this process.
+# Workers are forked while the server's threads run (see VisionPool);
+# VISION_START_METHOD=spawn avoids that at the cost of slower worker starts.
+vision_workers = int(os.getenv("VISION_WORKERS", "0"))
+vision_pool = VisionPool(
+    workers=vision_workers, start_method=os.getenv("VISION_START_METHOD")
+) if vision_workers > 0 else None
+if vision_pool:
+    # Stops the workers and unlinks the shared-memory ring
+    atexit.register(vision_pool.stop)
+
+# One Hands model per complexity so the load governor can switch without a stall
+hands_models = {} if vision_pool else {
+    complexity: mp_hands.Hands(model_complexity=complexity, min_detection_confidence= 0.6, min_tracking_confidence= 0.5)
+    for complexity in (1, 0)
+}
+
+# Steps frame-loop quality down under load and back up when there is headroom
+governor = LoadGovernor(
+    frame_budget_ms=float(os.getenv("FRAME_BUDGET_MS", "33")),
+    trigger_budget_ms=float(os.getenv("TRIGGER_BUDGET_MS", "20"))
+)
 
 hand_landmarks_data = []
-active_instrument = "piano"
 recent_notes = []
 last_played = []
 # Ensure the Images folder exists
 images_folder = "Images"
 os.makedirs(images_folder, exist_ok=True)
-pipeline = None
 is_recording = False
 recorded_notes = []
 last_append_time = None
@@ -45,6 +77,24 @@ last_append_time = None
 notes_folder = "notes"
 os.makedirs(notes_folder, exist_ok=True)
 
+# Offline renders of the sheet music, cached next to the PDFs (FLAC only with soundfile installed)
+AUDIO_INSTRUMENTS = ('piano', 'drums')
+
+# Background PDF engraving for batch generations
+engraving_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="engrave")
+MAX_BATCH_SIZE = 16
+MAX_BATCH_CONCURRENCY = 8
+
+# Seconds /set-instrument waits for an instrument's setup before answering
+INSTRUMENT_SETUP_TIMEOUT = 2.0
+
+# Instrument plugins, preloaded in the background and swapped in between frames
+instrument_registry = InstrumentRegistry()
+instrument_registry.register("piano", "instruments.piano:Piano")
+instrument_registry.register("drums", "instruments.drums:Drums")
+instrument_registry.preload_all()
+instrument_registry.activate("piano")
+
 
 @app.route('/generate-notes', methods=['POST'])
 def generate_notes():
@@ -59,25 +109,20 @@ def generate_notes():
 
     result = generate_notes_from_instructions(instructions)
 
+    if isinstance(result, list) and not validate_notes(result):
+        return jsonify({
+            "status": "error",
+            "message": "Generated notes failed validation."
+        }), 500
+
     if isinstance(result, list):
         try:
             # Create a filename with timestamp
             pdf_filename = f"notes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
             pdf_path = os.path.join(notes_folder, pdf_filename)
 
-            # Create a music21 stream
-            sheet_music = stream.Stream()
-            sheet_music.metadata = metadata.Metadata()
-            sheet_music.metadata.title = "AI powered notes"
-            sheet_music.append(tempo.MetronomeMark(number=120))
-            sheet_music.append(meter.TimeSignature('4/4'))
-
-            # Add notes to the stream
-            for note_data in result:
-                n = note.Note(note_data["pitch"])
-                n.duration.quarterLength = note_data["duration"] * 2
-                n.volume.velocity = note_data["velocity"]
-                sheet_music.append(n)
+            # Quantize the notes and lay them out into measures
+            sheet_music = score_from_generated(result, title="AI powered notes")
 
             # Write to PDF
             sheet_music.write(fmt='musicxml.pdf', fp=pdf_path)
@@ -100,41 +145,123 @@ def generate_notes():
 
 
 
-def generate_abstract_album_cover(notes):
+def engrave_notes(notes, title, filename):
+    """Write generated notes to a PDF in the notes folder, logging failures."""
+    success, message, _ = create_sheet_music_from_notes(notes, notes_folder, title, filename)
+    if not success:
+        print(message)
+
+
+@app.route('/generate-notes/batch', methods=['POST'])
+def generate_notes_batch():
     """
-    Generate an abstract, detailed album cover based on the most recent notes played.
+    Generate several compositions concurrently, from a list of `instructions`
+    or `variations` copies of one `instruction`. Results are streamed back as
+    newline-delimited JSON in completion order; valid ones are engraved to PDF
+    in the background under the returned filename.
     """
-    global pipeline
-    if pipeline is None:  # Check if the pipeline is already loaded
-        print("Loading StableDiffusion pipeline...")
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        pipeline = StableDiffusionPipeline.from_pretrained("CompVis/stable-diffusion-v1-4").to(device)
-        pipeline.safety_checker = None 
-    # Create a prompt based on the notes
-    note_colors = {
-        "C": "red", "D": "green", "E": "blue", "F": "yellow",
-        "G": "purple", "A": "orange", "B": "pink", "C_high": "cyan"
-    }
-    
-    prompt_elements = [f"{note_colors.get(note, 'colorful')} light" for note in notes]
-    prompt = (
-        "A detailed, vibrant abstract album cover featuring swirling, "
-        "dynamic patterns of " + ", ".join(prompt_elements) + ". "
-        "Highly artistic, detailed, and modern design, perfect for a modern album."
-    )
+    data = request.get_json(silent=True) or {}
+    try:
+        variations = int(data.get('variations', 1))
+        concurrency = int(data.get('concurrency', 4))
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "variations and concurrency must be integers."}), 400
+    if not 1 <= variations <= MAX_BATCH_SIZE:
+        return jsonify({"status": "error", "message": f"variations must be between 1 and {MAX_BATCH_SIZE}."}), 400
+
+    instructions = data.get('instructions')
+    if instructions is None and data.get('instruction'):
+        instructions = [data['instruction']] * variations
+
+    if not instructions:
+        return jsonify({"status": "error", "message": "No instructions provided."}), 400
+    if not isinstance(instructions, list) or not all(isinstance(item, str) and item.strip() for item in instructions):
+        return jsonify({"status": "error", "message": "instructions must be a list of non-empty strings."}), 400
+    if len(instructions) > MAX_BATCH_SIZE:
+        return jsonify({"status": "error", "message": f"At most {MAX_BATCH_SIZE} instructions per batch."}), 400
+
+    concurrency = max(1, min(concurrency, MAX_BATCH_CONCURRENCY))
+    batch_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    def stream_results():
+        for result in iter_batch(instructions, concurrency=concurrency):
+            payload = {
+                "index": result["index"],
+                "instruction": result["instruction"],
+                "attempts": result["attempts"],
+                "elapsed": round(result["elapsed"], 3)
+            }
+            if result["notes"] is None:
+                payload.update({"status": "error", "message": result["error"]})
+            else:
+                pdf_filename = f"notes_{batch_id}_{result['index']}.pdf"
+                engraving_executor.submit(engrave_notes, result["notes"], f"AI powered notes #{result['index'] + 1}", pdf_filename)
+                payload.update({"status": "success", "filename": pdf_filename, "notes": result["notes"]})
+            yield json.dumps(payload) + "\n"
+
+    return Response(stream_results(), mimetype='application/x-ndjson')
+
+
+
+@app.route('/generate-notes/stream', methods=['POST'])
+def generate_notes_stream():
+    """
+    Generate notes with a streamed completion. Each note is pushed over
+    Socket.IO as a `generated_note` event as soon as it is parsed, so the
+    frontend can start previewing before the response is finished. A final
+    `generated_notes_complete` event carries the engraved PDF filename.
+    Pass the client's Socket.IO `sid` to target it, otherwise events are broadcast.
+    """
+    data = request.get_json()
+    instructions = data.get('instructions')
+    sid = data.get('sid')
 
-    # Generate the image
-    image = pipeline(prompt, guidance_scale=7.5).images[0]
+    if not instructions:
+        return jsonify({"status": "error", "message": "No instructions provided."}), 400
 
-    # Ensure the images folder exists
-    os.makedirs(images_folder, exist_ok=True)
+    stream_id = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
 
-    # Use the current timestamp for the filename
-    filename = f"abstract_album_cover_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-    image_path = os.path.join(images_folder, filename)
-    image.save(image_path)
+    def run_stream():
+        notes = []
+        try:
+            for index, (note_data, is_valid) in enumerate(stream_notes_from_instructions(instructions)):
+                socketio.emit("generated_note", {
+                    "stream_id": stream_id,
+                    "index": index,
+                    "note": note_data,
+                    "valid": is_valid
+                }, to=sid)
+                if is_valid:
+                    notes.append(note_data)
+        except Exception as e:
+            socketio.emit("generated_notes_complete", {
+                "stream_id": stream_id,
+                "status": "error",
+                "message": f"Error generating notes: {str(e)}"
+            }, to=sid)
+            return
+
+        if not notes:
+            socketio.emit("generated_notes_complete", {
+                "stream_id": stream_id,
+                "status": "error",
+                "message": "Failed to generate notes."
+            }, to=sid)
+            return
 
-    return image_path
+        success, message, pdf_filename = create_sheet_music_from_notes(
+            notes, notes_folder, "AI powered notes", f"notes_{stream_id}.pdf"
+        )
+        socketio.emit("generated_notes_complete", {
+            "stream_id": stream_id,
+            "status": "success" if success else "error",
+            "message": message,
+            "filename": pdf_filename,
+            "count": len(notes)
+        }, to=sid)
+
+    socketio.start_background_task(run_stream)
+    return jsonify({"status": "success", "stream_id": stream_id}), 202
 
 
 @app.route('/generate-image', methods=['POST'])
@@ -144,8 +271,28 @@ def generate_image():
     if not last_played:
         return jsonify({"error": "No notes played yet."}), 400
     
-    image_path = generate_abstract_album_cover(last_played)
-    return jsonify({"message": "Image generated successfully!", "image_url": f"/Images/{os.path.basename(image_path)}"})
+    data = request.get_json(silent=True) or {}
+    sid = data.get('sid')
+
+    def on_preview(step, total_steps, preview):
+        # Low resolution previews every few steps; targeted at `sid` if given
+        socketio.emit("album_cover_preview", {
+            "step": step,
+            "total_steps": total_steps,
+            "image": f"data:image/png;base64,{preview}"
+        }, to=sid)
+
+    try:
+        image_path, stats = generate_abstract_album_cover(
+            last_played, images_folder, on_preview=on_preview, profile_name=data.get('profile')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "message": "Image generated successfully!",
+        "image_url": f"/Images/{os.path.basename(image_path)}",
+        "stats": stats
+    })
 
 @app.route('/album-covers/<string:filename>', methods=['DELETE'])
 def delete_album_cover(filename):
@@ -171,30 +318,54 @@ def serve_sheet(filename):
     """Serve generated images."""
     return send_from_directory(notes_folder, filename)
 
-def load_instrument(name):
-    """Dynamically load the instrument module."""
-    global active_instrument
-    try:
-        _ = importlib.import_module(f'instruments.{name}')
-        active_instrument = name
-        print(f"Loaded instrument: {name}")
-    except ModuleNotFoundError:
-        print(f"Instrument module '{name}' not found!")
-        active_instrument = None
-
 @app.route('/set-instrument', methods=['POST'])
 def set_instrument():
-    """Set the active instrument."""
-    global active_instrument
+    """Set the active instrument. The swap happens between frames once it is ready."""
     instrument_name = request.json.get('instrument')
-    active_instrument = instrument_name  # Store the chosen instrument
-    load_instrument(instrument_name)
-    if active_instrument:
-        return jsonify({"status": "success", "instrument": instrument_name}), 200
-    else:
+    try:
+        future = instrument_registry.activate(instrument_name)
+    except KeyError:
+        print(f"Instrument '{instrument_name}' not found!")
         return jsonify({"status": "error", "message": "Instrument not found!"}), 404
+    try:
+        # Most instruments are preloaded and ready quickly; a slow one is swapped in when done
+        future.result(timeout=INSTRUMENT_SETUP_TIMEOUT)
+    except FuturesTimeoutError:
+        pass
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Instrument '{instrument_name}' failed to load: {e}"}), 500
+    return jsonify({"status": "success", "instrument": instrument_name}), 200
+
+
+@app.route('/instruments', methods=['GET'])
+def get_instruments():
+    """List the registered instruments and the active one."""
+    return jsonify({
+        "instruments": instrument_registry.names(),
+        "active": instrument_registry.active_name
+    })
     
 
+@app.route('/delivery-stats', methods=['GET'])
+def get_delivery_stats():
+    """Report Socket.IO delivery queue depth, sent and dropped message counters."""
+    return jsonify(delivery.stats())
+
+
+@app.route('/governor', methods=['GET'])
+def get_governor():
+    """Report the active quality level of the frame loop and the measured frame times."""
+    return jsonify(governor.state())
+
+
+@app.route('/vision-workers', methods=['GET'])
+def get_vision_workers():
+    """Report vision worker throughput, handoff latency, drops and restarts."""
+    if vision_pool is None:
+        return jsonify({"workers": 0})
+    return jsonify(vision_pool.stats())
+
+
 @app.route('/hand-data', methods=['GET'])
 def get_hand_data():
     """Provide hand data to the frontend."""
@@ -202,77 +373,37 @@ def get_hand_data():
     return jsonify({'hands': hand_landmarks_data})  
 
 
-def round_to_nearest_duration(time_interval):
-    # Define the note durations based on a quarter note length of 0.5
-    note_durations = {
-        "eighth": 0.25,
-        "quarter": 0.5,
-        "dotted quarter": 0.75,
-        "half": 1.0,
-        "dotted half": 1.5,
-        "whole": 2.0
-    }
-    
-    # Find the closest duration
-    closest_note = min(note_durations, key=lambda note: abs(note_durations[note] - time_interval))
-    
-    return note_durations[closest_note]
-
 def Create_Sheet_Music(recorded_notes):
-    # Create a new music21 stream
-    sheet_music = stream.Stream()
-
-    sheet_music.metadata = metadata.Metadata()
-    sheet_music.metadata.title = "Untitled Custom Composition"
-    sheet_music.append(tempo.MetronomeMark(number=120))
-    sheet_music.append(meter.TimeSignature("4/4"))
-
-    # Map note names to pitches
-    note_mapping = {
-        "C": "C4",
-        "C#": "C#4",
-        "D": "D4",
-        "D#": "D#4",
-        "E": "E4",
-        "F": "F4",
-        "F#": "F#4",
-        "G": "G4",
-        "G#": "G#4",
-        "A": "A4",
-        "A#": "A#4",
-        "B": "B4",
-        "C_High": "C5"
-    }
-
-    # Convert recorded notes into music21 notes
-    for entry in recorded_notes:
-        notes = entry.get("notes", [])
-        time_interval = entry.get("time_interval")
-        if time_interval is None or time_interval < 0.2:
-            continue
-        time_interval = round_to_nearest_duration(time_interval)
-
-        # Calculate quarterLength based on time_interval and 120 BPM
-        quarter_length = time_interval / 0.5  # 0.5 seconds per beat at 120 BPM
-
-        if not notes:  # Treat as a rest if no notes are present
-            r = note.Rest()
-            r.quarterLength = quarter_length
-            sheet_music.append(r)
-        elif len(notes) == 1:  # Single note
-            pitch = notes[0]
-            if pitch in note_mapping:
-                n = note.Note(note_mapping[pitch])
-                n.quarterLength = quarter_length
-                sheet_music.append(n)
-        else:  # Multiple notes, treat as a chord
-            pitches = [note_mapping[n] for n in notes if n in note_mapping]
-            if pitches:
-                c = chord.Chord(pitches)
-                c.quarterLength = quarter_length
-                sheet_music.append(c)
-
-    return sheet_music
+    """Convert a recorded piano session into a music21 score."""
+    return score_from_recording(recorded_notes, title="Untitled Custom Composition")
+
+
+def capture_frames():
+    """
+    Capture frames and run hand tracking in this process.
+    Yields (frame, results, captured_at) like VisionPool.frames().
+    """
+    cap = cv2.VideoCapture(0)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+    try:
+        while True:
+            success, frame = cap.read()
+            if not success:
+                break
+            captured_at = time.monotonic()
+            settings = governor.settings
+
+            frame = cv2.flip(frame, 1)
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            if settings["inference_scale"] < 1.0:
+                # Landmarks are normalized, so they still map onto the full frame
+                rgb_frame = cv2.resize(rgb_frame, None, fx=settings["inference_scale"],
+                                       fy=settings["inference_scale"], interpolation=cv2.INTER_AREA)
+            results = hands_models[settings["model_complexity"]].process(rgb_frame)
+            yield frame, results, captured_at
+    finally:
+        cap.release()
 
 
 @app.route('/webcam')
@@ -281,64 +412,68 @@ def webcam():
     def generate_frames():
         global recent_notes
         global recorded_notes
-        cap = cv2.VideoCapture(0)
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
         global hand_landmarks_data
         global last_append_time
         global last_played
 
-        while True:
-            success, frame = cap.read()
-            if not success:
-                break
-
-            frame = cv2.flip(frame, 1)
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = hands.process(rgb_frame)
-
-            # Process based on the instrument
-            if active_instrument == "piano":
-                piano.draw_keys(frame)
-                recent_notes = piano.process_hand_landmarks(results, frame, hand_landmarks_data)
+        settings = governor.settings
+        frames = vision_pool.frames() if vision_pool else capture_frames()
+
+        # Closed explicitly so the camera (or the vision workers) are released when the client goes away
+        with closing(frames):
+            for frame, results, frame_started in frames:
+                # Process based on the instrument
+                instrument = instrument_registry.current()
+                if instrument is None:
+                    hand_landmarks_data.clear()
+                    recent_notes = []
+                else:
+                    instrument.draw_landmarks = settings["draw_landmarks"]
+                    instrument.draw(frame)
+                    recent_notes = instrument.process(results, frame, hand_landmarks_data)
+                trigger_ms = (time.monotonic() - frame_started) * 1000
                 if recent_notes:
                     last_played = recent_notes.copy()
-                    socketio.emit("recent_key", {"key": recent_notes[-1] if recent_notes else ""})
-                if is_recording:
-                    if not recorded_notes:
-                        if recent_notes:
+                    delivery.publish("recent_key", {"key": recent_notes[-1] if recent_notes else ""})
+                if instrument is not None and instrument.records_notes:
+                    if is_recording:
+                        if not recorded_notes:
+                            if recent_notes:
+                                recorded_notes.append({
+                                    'notes': recent_notes.copy(),
+                                    'time_interval': None
+                                })
+                                last_append_time = time.time()
+                        elif recent_notes != recorded_notes[-1]['notes']:
+                            current_time = time.time()
+                            time_interval = current_time - last_append_time
+                            last_append_time = current_time
+                            recorded_notes[-1]['time_interval'] = time_interval
                             recorded_notes.append({
                                 'notes': recent_notes.copy(),
                                 'time_interval': None
                             })
-                            last_append_time = time.time()
-                    elif recent_notes != recorded_notes[-1]['notes']:
-                        current_time = time.time()
-                        time_interval = current_time - last_append_time
-                        last_append_time = current_time
-                        recorded_notes[-1]['time_interval'] = time_interval
-                        recorded_notes.append({
-                            'notes': recent_notes.copy(),
-                            'time_interval': None
-                        })
-                else:
-                    last_append_time = None
-                    if recorded_notes:
-                        sheet_music = Create_Sheet_Music(recorded_notes)
-                        pdf_path = f"notes/output_sheet_music_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-                        sheet_music.write(fmt='musicxml.pdf', fp=pdf_path)
-                        recorded_notes = []
-            elif active_instrument == "drums":
-                drums.process_hand_landmarks(results, frame, hand_landmarks_data)
-
-            # Emit hand data via WebSocket
-            socketio.emit('hand_data', {'hands': hand_landmarks_data})
-
-            # Encode and stream video
-            _, buffer = cv2.imencode('.jpg', frame)
-            frame = buffer.tobytes()
-            yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-        cap.release()
+                    else:
+                        last_append_time = None
+                        if recorded_notes:
+                            sheet_music = Create_Sheet_Music(recorded_notes)
+                            pdf_path = f"notes/output_sheet_music_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+                            sheet_music.write(fmt='musicxml.pdf', fp=pdf_path)
+                            recorded_notes = []
+
+                # Hand data is delivered over WebSocket by the delivery worker.
+                # Copy it: the instrument clears and refills the list every frame.
+                delivery.publish('hand_data', {'hands': list(hand_landmarks_data)})
+
+                delivery.max_rate = settings["emit_rate"]
+
+                # Encode and stream video
+                _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, settings["jpeg_quality"]])
+                frame = buffer.tobytes()
+                settings = governor.record(trigger_ms, (time.monotonic() - frame_started) * 1000)
+                if vision_pool:
+                    vision_pool.set_inference(settings["model_complexity"], settings["inference_scale"])
+                yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
 
     return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
@@ -390,11 +525,16 @@ def get_sheet_music():
 
 @app.route('/sheet-music/<string:filename>', methods=['DELETE'])
 def delete_sheet_music(filename):
-    """Delete a specific sheet music file."""
+    """Delete a specific sheet music file and its cached audio renders."""
     file_path = os.path.join(notes_folder, filename)
     if os.path.exists(file_path):
         try:
             os.remove(file_path)
+            for instrument in AUDIO_INSTRUMENTS:
+                for audio_format in AUDIO_FORMATS:
+                    audio_path = os.path.join(notes_folder, audio_filename_for(filename, instrument, audio_format))
+                    if os.path.exists(audio_path):
+                        os.remove(audio_path)
             return jsonify({"status": "success", "message": f"{filename} has been deleted."}), 200
         except Exception as e:
             return jsonify({"status": "error", "message": f"Error deleting file: {str(e)}"}), 500
@@ -407,6 +547,42 @@ def serve_sheet_music(filename):
     """Serve sheet music files."""
     return send_from_directory(notes_folder, filename)
 
+def audio_filename_for(filename, instrument, audio_format):
+    """Name of the cached audio render for a sheet music file."""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    suffix = "" if instrument == "piano" else f"_{instrument}"
+    return f"{stem}{suffix}.{audio_format}"
+
+@app.route('/sheet-music-audio/<path:filename>', methods=['GET'])
+def get_sheet_music_audio(filename):
+    """
+    Serve a sheet music file as audio. The score is rendered offline, without
+    an audio device, on first request and cached next to the PDF.
+    Query parameters: format (wav, or flac when soundfile is installed), instrument (piano or drums).
+    """
+    audio_format = request.args.get('format', 'wav')
+    instrument = request.args.get('instrument', 'piano')
+    if audio_format not in AUDIO_FORMATS or instrument not in AUDIO_INSTRUMENTS:
+        return jsonify({"status": "error", "message": "Unsupported format or instrument."}), 400
+
+    audio_filename = audio_filename_for(filename, instrument, audio_format)
+    audio_path = os.path.join(notes_folder, audio_filename)
+    if not os.path.exists(audio_path):
+        musicxml_path = os.path.join(notes_folder, os.path.splitext(os.path.basename(filename))[0] + '.musicxml')
+        if not os.path.exists(musicxml_path):
+            return jsonify({"status": "error", "message": f"File {filename} not found."}), 404
+        # Render to a temporary file so concurrent requests never serve a partial file
+        temp_path = os.path.join(notes_folder, f".{threading.get_ident()}_{audio_filename}")
+        try:
+            render_sheet_music(musicxml_path, temp_path, instrument)
+            os.replace(temp_path, audio_path)
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return jsonify({"status": "error", "message": f"Error rendering audio: {str(e)}"}), 500
+
+    return send_from_directory(notes_folder, audio_filename, conditional=True)
+
 @app.route('/sheet-music-player/<path:filename>', methods=['POST'])
 def play_musicxml(filename):
     file_path = os.path.join(notes_folder, filename)
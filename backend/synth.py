@@ -0,0 +1,186 @@
+import os
+import numpy as np
+from scipy.io import wavfile
+from music21 import converter, tempo
+
+try:
+    # Optional, only needed for FLAC output (also fails without libsndfile)
+    import soundfile
+except (ImportError, OSError):
+    soundfile = None
+
+sounds_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sounds")
+
+SAMPLE_RATE = 44100
+BLOCK_SIZE = 4096
+
+# Relative amplitude of the first harmonics of the synthesized piano tone
+PIANO_HARMONICS = np.array([1.0, 0.5, 0.25, 0.12, 0.06])
+ATTACK = 0.005   # seconds
+DECAY = 0.8      # seconds for the held tone to fall to 1/e
+RELEASE = 0.08   # seconds of fade out after the note ends
+
+# General MIDI drum pitches, anything else falls back on the pitch range
+KICK_PITCHES = {35, 36}
+SNARE_PITCHES = {38, 40}
+
+# Formats write_audio can produce on this machine
+AUDIO_FORMATS = ("wav", "flac") if soundfile is not None else ("wav",)
+
+_drum_samples = {}
+
+
+def load_sample(filename, sample_rate=SAMPLE_RATE):
+    """Load a sample from the sounds folder as normalized mono float32 at `sample_rate`."""
+    key = (filename, sample_rate)
+    if key not in _drum_samples:
+        file_rate, sample = wavfile.read(os.path.join(sounds_folder, filename))
+        if len(sample.shape) > 1:
+            sample = np.mean(sample, axis=1)
+        sample = sample.astype(np.float32)
+        sample /= np.max(np.abs(sample))
+        if file_rate != sample_rate:
+            positions = np.arange(0, len(sample) - 1, file_rate / sample_rate)
+            sample = np.interp(positions, np.arange(len(sample)), sample).astype(np.float32)
+        _drum_samples[key] = sample
+    return _drum_samples[key]
+
+
+def _mix_piano(out, block_start, starts, lengths, pitches, gains, sample_rate):
+    """Add the active piano voices to one output block."""
+    t = (block_start + np.arange(len(out)))[None, :] - starts[:, None]
+    held = lengths[:, None]
+    release = RELEASE * sample_rate
+    sounding = (t >= 0) & (t < held + release)
+
+    seconds = t / sample_rate
+    frequencies = 440.0 * 2.0 ** ((pitches - 69) / 12.0)
+    phase = (2 * np.pi * frequencies)[:, None] * seconds
+    tone = np.zeros_like(phase)
+    for harmonic, amplitude in enumerate(PIANO_HARMONICS, start=1):
+        tone += amplitude * np.sin(harmonic * phase)
+
+    envelope = np.minimum(seconds / ATTACK, 1.0) * np.exp(-seconds / DECAY)
+    envelope *= np.clip(1.0 - (t - held) / release, 0.0, 1.0)
+    out += (np.where(sounding, tone * envelope, 0.0) * gains[:, None]).sum(axis=0)
+
+
+def _mix_samples(out, block_start, starts, samples, gains):
+    """Add the active sample voices (one-shot, full sample length) to one output block."""
+    for sample in {id(s): s for s in samples}.values():
+        voices = np.array([s is sample for s in samples])
+        t = (block_start + np.arange(len(out)))[None, :] - starts[voices][:, None]
+        sounding = (t >= 0) & (t < len(sample))
+        values = sample[np.clip(t, 0, len(sample) - 1)]
+        out += (np.where(sounding, values, 0.0) * gains[voices][:, None]).sum(axis=0)
+
+
+def render_notes(onsets, durations, pitches, velocities, instrument="piano",
+                 sample_rate=SAMPLE_RATE, block_size=BLOCK_SIZE, length=0.0):
+    """
+    Render note arrays (onset and duration in seconds, MIDI pitch, velocity)
+    to a mono float32 signal. Output is produced block by block; within a
+    block every sounding voice is computed at once as a 2D array and summed.
+
+    instrument="piano" uses an additive synth tone, instrument="drums" plays
+    the kick and snare samples (GM kick/snare pitches, otherwise the lower
+    half of the pitch range is kick and the upper half snare).
+
+    The output lasts at least `length` seconds, so trailing rests are kept.
+    """
+    onsets = np.asarray(onsets, dtype=float)
+    pitches = np.asarray(pitches, dtype=float)
+    gains = np.asarray(velocities, dtype=float) / 127.0
+    min_samples = int(np.rint(length * sample_rate))
+    if len(onsets) == 0:
+        return np.zeros(min_samples, dtype=np.float32)
+
+    starts = np.rint(onsets * sample_rate).astype(np.int64)
+    lengths = np.maximum(np.rint(np.asarray(durations, dtype=float) * sample_rate).astype(np.int64), 1)
+
+    if instrument == "drums":
+        kick = load_sample("Electronic-Kick-1.wav", sample_rate)
+        snare = load_sample("Ensoniq-ESQ-1-Snare.wav", sample_rate)
+        split = (pitches.min() + pitches.max()) / 2
+        samples = [
+            kick if p in KICK_PITCHES else snare if p in SNARE_PITCHES else kick if p <= split else snare
+            for p in pitches.astype(int).tolist()
+        ]
+        stops = starts + np.array([len(s) for s in samples])
+    elif instrument == "piano":
+        stops = starts + lengths + int(RELEASE * sample_rate)
+    else:
+        raise ValueError(f"Unknown instrument '{instrument}'")
+
+    order = np.argsort(starts, kind="stable")
+    starts, stops, lengths, pitches, gains = starts[order], stops[order], lengths[order], pitches[order], gains[order]
+    if instrument == "drums":
+        samples = [samples[i] for i in order]
+
+    # Voices are sorted by start; a running maximum of their stop times lets
+    # each block find its first possibly-sounding voice with a binary search
+    stops_so_far = np.maximum.accumulate(stops)
+    audio = np.zeros(max(int(stops.max()), min_samples), dtype=np.float64)
+    for block_start in range(0, len(audio), block_size):
+        block_end = min(block_start + block_size, len(audio))
+        first = np.searchsorted(stops_so_far, block_start, side="right")
+        last = np.searchsorted(starts, block_end, side="left")
+        if first >= last:
+            continue
+        active = np.arange(first, last)
+        active = active[stops[active] > block_start]
+        if len(active) == 0:
+            continue
+        out = audio[block_start:block_end]
+        if instrument == "drums":
+            _mix_samples(out, block_start, starts[active], [samples[i] for i in active], gains[active])
+        else:
+            _mix_piano(out, block_start, starts[active], lengths[active], pitches[active], gains[active], sample_rate)
+
+    peak = np.max(np.abs(audio))
+    if peak > 1.0:
+        audio /= peak
+    return (audio * 0.9).astype(np.float32)
+
+
+def arrays_from_score(score):
+    """
+    Read note arrays (onset, duration in seconds, pitch, velocity) back from
+    a music21 score, e.g. one parsed from the MusicXML written next to a PDF.
+    Also returns the score's total length in seconds, rests included.
+    """
+    marks = score.flatten().getElementsByClass(tempo.MetronomeMark)
+    bpm = marks[0].number if marks and marks[0].number else 120
+    seconds_per_quarter = 60.0 / bpm
+
+    onsets, durations, pitches, velocities = [], [], [], []
+    for element in score.stripTies().flatten().notes:
+        onset = float(element.offset) * seconds_per_quarter
+        duration = float(element.quarterLength) * seconds_per_quarter
+        velocity = element.volume.velocity or 100
+        for p in element.pitches:
+            onsets.append(onset)
+            durations.append(duration)
+            pitches.append(p.midi)
+            velocities.append(velocity)
+    length = float(score.highestTime) * seconds_per_quarter
+    return np.array(onsets), np.array(durations), np.array(pitches), np.array(velocities), length
+
+
+def write_audio(path, audio, sample_rate=SAMPLE_RATE):
+    """Write a float signal to WAV, or to FLAC when `path` ends in .flac (needs soundfile)."""
+    if path.endswith(".flac"):
+        if soundfile is None:
+            raise RuntimeError("FLAC output needs the soundfile package")
+        soundfile.write(path, audio, sample_rate, subtype="PCM_16")
+    else:
+        wavfile.write(path, sample_rate, (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16))
+
+
+def render_sheet_music(musicxml_path, audio_path, instrument="piano"):
+    """Render the MusicXML saved alongside a sheet music PDF to an audio file."""
+    score = converter.parse(musicxml_path)
+    onsets, durations, pitches, velocities, length = arrays_from_score(score)
+    audio = render_notes(onsets, durations, pitches, velocities, instrument=instrument, length=length)
+    write_audio(audio_path, audio)
+    return audio_path
@@ -0,0 +1,32 @@
+import time
+
+from AI_Utils import iter_batch
+from completion_stub import make_stub_completion
+
+
+def counting(completion):
+    calls = []
+
+    async def wrapped(messages):
+        calls.append(messages)
+        return await completion(messages)
+
+    return wrapped, calls
+
+
+def test_iter_batch_yields_every_instruction():
+    completion, calls = counting(make_stub_completion(latency=0.01, note_count=4, seed=1))
+    results = list(iter_batch(["a", "b", "c"], concurrency=2, completion=completion))
+    assert sorted(result["index"] for result in results) == [0, 1, 2]
+    assert all(result["notes"] and result["error"] is None for result in results)
+    assert len(calls) == 3
+
+
+def test_closing_iter_batch_cancels_remaining_completions():
+    completion, calls = counting(make_stub_completion(latency=0.2, note_count=4, seed=2))
+    results = iter_batch(["a"] * 10, concurrency=2, completion=completion)
+    next(results)
+    results.close()
+    time.sleep(0.6)
+    # The first two plus the ones started as slots freed up, never the whole batch
+    assert len(calls) < 10
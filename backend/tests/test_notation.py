@@ -0,0 +1,49 @@
+import pytest
+
+from notation import score_from_recording, score_from_generated
+
+
+def elements(score):
+    return [(type(e).__name__, float(e.offset), float(e.quarterLength)) for e in score.flatten().notesAndRests]
+
+
+def test_rest_only_recording_keeps_its_rests():
+    score = score_from_recording([{"notes": [], "time_interval": 1.0}, {"notes": [], "time_interval": 1.0}])
+    assert elements(score) == [("Rest", 0.0, 4.0)]
+
+
+def test_trailing_rests_are_kept():
+    recording = [
+        {"notes": ["C"], "time_interval": 0.5},
+        {"notes": [], "time_interval": 3.0},
+        {"notes": ["D"], "time_interval": None},  # still held when recording stopped
+    ]
+    assert elements(score_from_recording(recording)) == [
+        ("Note", 0.0, 1.0), ("Rest", 1.0, 3.0), ("Rest", 4.0, 4.0)
+    ]
+
+
+def test_simultaneous_notes_become_a_chord():
+    recording = [{"notes": ["C"], "time_interval": 0.5}, {"notes": ["D", "E"], "time_interval": 1.0}]
+    assert elements(score_from_recording(recording)) == [("Note", 0.0, 1.0), ("Chord", 1.0, 2.0), ("Rest", 3.0, 1.0)]
+
+
+def test_generated_notes_tie_across_barlines():
+    notes = [{"time": 1.5, "pitch": 60, "duration": 1.0, "velocity": 90}]
+    score = score_from_generated(notes)
+    tied = [n for n in score.flatten().notes]
+    assert [n.tie.type for n in tied] == ["start", "stop"]
+    assert sum(float(n.quarterLength) for n in tied) == 2.0
+
+
+def test_legato_run_with_uneven_holds_has_no_gaps():
+    # Holds that aren't a standard length still follow each other without rests
+    recording = [{"notes": [name], "time_interval": 1.2} for name in ["C", "D", "E", "F"]]
+    assert elements(score_from_recording(recording)) == [
+        ("Note", 0.0, 2.0), ("Note", 2.0, 2.0), ("Note", 4.0, 2.0), ("Note", 6.0, 2.0)
+    ]
+
+
+def test_negative_onsets_are_rejected():
+    with pytest.raises(ValueError):
+        score_from_generated([{"time": -1, "pitch": 60, "duration": 1.0, "velocity": 90}])
@@ -0,0 +1,87 @@
+import json
+import random
+
+import pytest
+
+from AI_Utils import NoteStreamParser, stream_notes_from_instructions, validate_note
+from completion_stub import make_stub_notes, make_stub_stream
+
+
+def feed_all(parser, chunks):
+    objects = []
+    for chunk in chunks:
+        objects.extend(parser.feed(chunk))
+    return objects
+
+
+def chunked(text, size):
+    return [text[start:start + size] for start in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 10000])
+def test_parser_yields_every_note_for_any_chunking(chunk_size):
+    notes = make_stub_notes(20, random.Random(1))
+    parser = NoteStreamParser()
+    assert feed_all(parser, chunked(json.dumps(notes, indent=2), chunk_size)) == notes
+    assert parser.closed
+
+
+def test_parser_returns_notes_as_soon_as_they_close():
+    parser = NoteStreamParser()
+    assert parser.feed('[{"time": 0, "pitch": 60, "duration": 1, "velocity": 90}, {"time"') == [
+        {"time": 0, "pitch": 60, "duration": 1, "velocity": 90}
+    ]
+    assert parser.feed(': 1, "pitch": 62, "duration": 1, "velocity": 90}]') == [
+        {"time": 1, "pitch": 62, "duration": 1, "velocity": 90}
+    ]
+
+
+def test_parser_ignores_code_fence_and_trailing_text():
+    notes = make_stub_notes(3, random.Random(2))
+    text = "```json\n" + json.dumps(notes) + "\n```\nEnjoy {the} tune!"
+    assert feed_all(NoteStreamParser(), chunked(text, 5)) == notes
+
+
+def test_parser_ignores_braces_in_prose_before_the_array():
+    notes = make_stub_notes(2, random.Random(3))
+    assert NoteStreamParser().feed("Sure {here}: " + json.dumps(notes)) == notes
+
+
+def test_parser_handles_brackets_and_escapes_inside_strings():
+    notes = [{"time": 0, "pitch": 60, "duration": 1, "velocity": 90, "comment": "a \"}]\" b"}]
+    assert feed_all(NoteStreamParser(), chunked(json.dumps(notes), 2)) == notes
+
+
+def test_parser_reports_malformed_object_and_keeps_going():
+    text = '[{"time":0,"pitch":60,}, {"time": 1, "pitch": 62, "duration": 1, "velocity": 90}]'
+    objects = NoteStreamParser().feed(text)
+    assert objects == ['{"time":0,"pitch":60,}', {"time": 1, "pitch": 62, "duration": 1, "velocity": 90}]
+    assert [validate_note(note) for note in objects] == [False, True]
+
+
+def test_stream_notes_from_stub():
+    stub = make_stub_stream(first_token_latency=0, token_latency=0, chunk_size=5, note_count=12, seed=4)
+    results = list(stream_notes_from_instructions("a calm melody", stream_completion=stub))
+    assert results == [(note, True) for note in make_stub_notes(12, random.Random(4))]
+
+
+def test_stream_notes_reports_invalid_notes():
+    def stream_completion(messages):
+        yield from chunked('Here you go: [{"time": 0, "pitch": 200, "duration": 1, "velocity": 90}, '
+                           '{"time":0,"pitch":60,}, {"time": 1, "pitch": 64, "duration": 0.5, "velocity": 80}]', 6)
+
+    results = list(stream_notes_from_instructions("anything", stream_completion=stream_completion))
+    assert [is_valid for _, is_valid in results] == [False, False, True]
+    assert results[-1][0] == {"time": 1, "pitch": 64, "duration": 0.5, "velocity": 80}
+
+
+def test_stream_notes_stops_reading_after_the_array():
+    consumed = []
+
+    def stream_completion(messages):
+        for chunk in ['[{"time": 0, "pitch": 60, "duration": 1, "velocity": 90}]', " and more", " text"]:
+            consumed.append(chunk)
+            yield chunk
+
+    assert len(list(stream_notes_from_instructions("anything", stream_completion=stream_completion))) == 1
+    assert len(consumed) == 1
@@ -0,0 +1,557 @@
+import time
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+from types import SimpleNamespace
+import numpy as np
+import cv2
+
+MAX_HANDS = 2
+LANDMARKS = 21
+
+# Slot states
+SLOT_FREE = 0
+SLOT_CAPTURED = 1
+SLOT_INFERRED = 2
+SLOT_READING = 3
+
+# Indexes into the shared control array
+CONTROL_MODEL_COMPLEXITY = 0
+CONTROL_INFERENCE_SCALE = 1
+CONTROL_STOP = 2
+CONTROL_LAST_SEQ = 3
+CONTROL_DROPPED = 4
+CONTROL_CAPTURE_GENERATION = 5
+CONTROL_SIZE = 8
+
+# Seconds a worker waits for a task before checking the stop flag
+POLL_INTERVAL = 0.2
+
+# Indexes into the per-slot timestamps (time.monotonic, shared by all processes)
+TIME_CAPTURED = 0
+TIME_INFERENCE_STARTED = 1
+TIME_INFERRED = 2
+
+
+class FrameRing:
+    """
+    Fixed-slot ring buffer in shared memory holding camera frames and their
+    hand landmarks, so frames move between processes without pickling.
+
+    Every slot has a sequence number, a state (free, captured, inferred,
+    being read) and an owner (inference worker id + 1, 0 when free). Only
+    small (slot, seq) tuples travel over pipes; every state change first
+    checks that the slot still holds that sequence number.
+    """
+
+    def __init__(self, slots, height, width, name=None, create=False):
+        self.spec = None
+        self.slots, self.height, self.width = slots, height, width
+
+        fields = [
+            ("control", np.float64, (CONTROL_SIZE,)),
+            ("times", np.float64, (slots, 3)),
+            ("seq", np.int64, (slots,)),
+            ("landmarks", np.float32, (slots, MAX_HANDS, LANDMARKS, 3)),
+            ("state", np.int8, (slots,)),
+            ("owner", np.int8, (slots,)),
+            ("hand_count", np.int8, (slots,)),
+            ("handedness", np.int8, (slots, MAX_HANDS)),
+            ("frames", np.uint8, (slots, height, width, 3)),
+        ]
+        offsets = []
+        size = 0
+        for _, dtype, shape in fields:
+            size = -(-size // 8) * 8
+            offsets.append(size)
+            size += int(np.prod(shape)) * np.dtype(dtype).itemsize
+
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        for (field, dtype, shape), offset in zip(fields, offsets):
+            setattr(self, field, np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset))
+        if create:
+            self.shm.buf[:size] = bytes(size)
+        self.spec = (self.shm.name, slots, height, width)
+
+    @classmethod
+    def attach(cls, spec):
+        name, slots, height, width = spec
+        return cls(slots, height, width, name=name)
+
+    def close(self):
+        # Drop the numpy views first, the buffer can't be closed while they exist
+        for field in ("control", "times", "seq", "landmarks", "state", "owner", "hand_count", "handedness", "frames"):
+            setattr(self, field, None)
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def make_synthetic_frame(height, width, seed=0):
+    """A gradient frame with noise, standing in for the camera."""
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(0, 200, width, dtype=np.float32)[None, :, None]
+    frame = np.broadcast_to(gradient, (height, width, 3)) + rng.normal(0, 8, (height, width, 3))
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def capture_worker(spec, source, fps, tasks, generation):
+    """
+    Capture process: writes mirrored camera frames straight into free ring
+    slots and hands (slot, seq) to the inference workers round-robin, each
+    over its own pipe. A frame is dropped when its slot hasn't been released
+    yet. Exits on stop or when the supervisor bumps the capture generation.
+
+    `tasks` is a list of (worker_id, connection) pairs.
+    """
+    ring = FrameRing.attach(spec)
+    if source == "synthetic":
+        synthetic = make_synthetic_frame(ring.height, ring.width)
+        cap = None
+    else:
+        cap = cv2.VideoCapture(source)
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, ring.width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, ring.height)
+
+    tasks = list(tasks)
+    seq = int(ring.control[CONTROL_LAST_SEQ])
+    next_frame = time.monotonic()
+    try:
+        while not ring.control[CONTROL_STOP] and ring.control[CONTROL_CAPTURE_GENERATION] == generation:
+            if cap is None:
+                if fps:
+                    next_frame += 1.0 / fps
+                    time.sleep(max(0.0, next_frame - time.monotonic()))
+                frame = synthetic
+            else:
+                success, frame = cap.read()
+                if not success:
+                    break
+                if frame.shape[:2] != (ring.height, ring.width):
+                    frame = cv2.resize(frame, (ring.width, ring.height))
+
+            seq += 1
+            slot = seq % ring.slots
+            if ring.state[slot] != SLOT_FREE or not tasks:
+                # The consumers are behind: drop the frame rather than wait on them
+                ring.control[CONTROL_DROPPED] += 1
+                time.sleep(0.001)
+                continue
+
+            worker_id, connection = tasks[seq % len(tasks)]
+            ring.times[slot, TIME_CAPTURED] = time.monotonic()
+            if cap is None:
+                np.copyto(ring.frames[slot], frame)
+            else:
+                cv2.flip(frame, 1, dst=ring.frames[slot])
+            ring.seq[slot] = seq
+            ring.owner[slot] = worker_id + 1
+            ring.control[CONTROL_LAST_SEQ] = seq
+            ring.state[slot] = SLOT_CAPTURED
+            try:
+                connection.send((slot, seq))
+            except OSError:
+                # The worker is gone; skip it until the supervisor restarts us with its replacement
+                ring.owner[slot] = 0
+                ring.state[slot] = SLOT_FREE
+                ring.control[CONTROL_DROPPED] += 1
+                tasks.remove((worker_id, connection))
+    finally:
+        if cap is not None:
+            cap.release()
+        ring.close()
+
+
+def inference_worker(spec, worker_id, inference, tasks, results):
+    """
+    Inference process: runs MediaPipe Hands on captured slots in place and
+    writes the landmark arrays back into the same slot. Reads tasks from and
+    reports finished slots on its own pipes, so a worker that dies can't
+    leave a lock held that the others need.
+    """
+    ring = FrameRing.attach(spec)
+    models = {}
+
+    def get_hands(model_complexity):
+        if model_complexity not in models:
+            import mediapipe as mp
+            models[model_complexity] = mp.solutions.hands.Hands(
+                model_complexity=model_complexity, min_detection_confidence=0.6, min_tracking_confidence=0.5
+            )
+        return models[model_complexity]
+
+    def holds(slot, seq):
+        return (ring.seq[slot] == seq and ring.state[slot] == SLOT_CAPTURED
+                and ring.owner[slot] == worker_id + 1)
+
+    try:
+        while not ring.control[CONTROL_STOP]:
+            try:
+                if not tasks.poll(POLL_INTERVAL):
+                    continue
+                slot, seq = tasks.recv()
+            except EOFError:
+                break
+            if not holds(slot, seq):
+                continue
+            ring.times[slot, TIME_INFERENCE_STARTED] = time.monotonic()
+
+            hand_count = 0
+            landmarks = np.zeros((MAX_HANDS, LANDMARKS, 3), dtype=np.float32)
+            handedness = np.zeros(MAX_HANDS, dtype=np.int8)
+            if inference == "mediapipe":
+                rgb_frame = cv2.cvtColor(ring.frames[slot], cv2.COLOR_BGR2RGB)
+                scale = float(ring.control[CONTROL_INFERENCE_SCALE]) or 1.0
+                if scale < 1.0:
+                    rgb_frame = cv2.resize(rgb_frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                hand_results = get_hands(int(ring.control[CONTROL_MODEL_COMPLEXITY])).process(rgb_frame)
+                if hand_results.multi_hand_landmarks:
+                    for hand_landmarks, hand_class in zip(hand_results.multi_hand_landmarks[:MAX_HANDS],
+                                                          hand_results.multi_handedness):
+                        landmarks[hand_count] = [(lm.x, lm.y, lm.z) for lm in hand_landmarks.landmark]
+                        handedness[hand_count] = hand_class.classification[0].label == "Right"
+                        hand_count += 1
+
+            # The slot must still hold our frame before anything is written back
+            if not holds(slot, seq):
+                continue
+            ring.landmarks[slot] = landmarks
+            ring.handedness[slot] = handedness
+            ring.hand_count[slot] = hand_count
+            ring.times[slot, TIME_INFERRED] = time.monotonic()
+            ring.state[slot] = SLOT_INFERRED
+            results.send((slot, seq))
+    finally:
+        ring.close()
+
+
+def results_from_arrays(landmarks, handedness, hand_count):
+    """Rebuild a MediaPipe-like results object (real landmark protobufs) from the ring arrays."""
+    from mediapipe.framework.formats import landmark_pb2, classification_pb2
+
+    if not hand_count:
+        return SimpleNamespace(multi_hand_landmarks=None, multi_handedness=None)
+    hand_landmarks = []
+    hand_classes = []
+    for hand in range(hand_count):
+        landmark_list = landmark_pb2.NormalizedLandmarkList()
+        for x, y, z in landmarks[hand].tolist():
+            landmark_list.landmark.add(x=x, y=y, z=z)
+        hand_landmarks.append(landmark_list)
+        classification_list = classification_pb2.ClassificationList()
+        classification_list.classification.add(label="Right" if handedness[hand] else "Left", score=1.0)
+        hand_classes.append(classification_list)
+    return SimpleNamespace(multi_hand_landmarks=hand_landmarks, multi_handedness=hand_classes)
+
+
+class VisionPool:
+    """
+    Runs camera capture and hand tracking in worker processes. Frames and
+    landmarks are exchanged through a shared-memory FrameRing; a supervisor
+    thread restarts any process that dies.
+
+    Every inference worker has its own task and result pipe. When a worker
+    dies, its pipes are replaced, the slots it owned are freed and capture is
+    restarted to pick up the new task pipe. When capture fails
+    `max_capture_failures` times in a row without delivering a frame (no
+    camera, camera unplugged), the pool gives up and frames() ends.
+
+    The processes run only while frames() is being consumed: they are
+    started by the first call and stopped (releasing the camera) when the
+    generator is closed. frames() is consumed by a single frame loop in the
+    web process.
+
+    With the default fork start method, workers are forked from whichever
+    thread starts them (a request thread, or the supervisor on a restart)
+    while the server's other threads keep running. The child only runs the
+    functions in this module, but a lock another thread held at fork time
+    (e.g. inside a C library) stays locked in the child and can hang it.
+    Pass start_method="spawn" to avoid that, at the cost of every worker
+    re-importing the main module.
+    """
+
+    def __init__(self, workers=2, slots=8, height=480, width=640, source=0, fps=None, inference="mediapipe",
+                 start_method=None, max_capture_failures=3):
+        self.workers = workers
+        self.source = source
+        self.fps = fps
+        self.inference = inference
+        self.max_capture_failures = max_capture_failures
+        # Workers only run the functions in this module, so fork them where possible:
+        # spawn would re-run the server's module-level setup (models, MIDI) in every child
+        if start_method is None:
+            start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        self.context = multiprocessing.get_context(start_method)
+        self.ring = FrameRing(slots, height, width, create=True)
+        self.ring.control[CONTROL_MODEL_COMPLEXITY] = 1
+        self.ring.control[CONTROL_INFERENCE_SCALE] = 1.0
+        self.capture_process = None
+        self.inference_processes = {}
+        self.task_connections = {}    # worker id -> send end of its task pipe
+        self.result_connections = {}  # worker id -> receive end of its result pipe
+        self.restarts = 0
+        self.capture_failures = 0
+        self.capture_failed = False
+        self.delivered = 0
+        self.stale = 0
+        self.handoff_ms = None
+        self.started_at = None
+        self._supervisor = None
+        self._running = False
+        self._stopped = False
+        self._capture_seq = 0
+        self._consumers = 0
+        # Serialises start()/halt() between frame loops
+        self._lifecycle_lock = threading.Lock()
+        # Guards slot state changes made in this process (frame loop and supervisor)
+        self._lock = threading.Lock()
+
+    def _start_capture(self):
+        generation = self.ring.control[CONTROL_CAPTURE_GENERATION]
+        tasks = sorted(self.task_connections.items())
+        self._capture_seq = int(self.ring.control[CONTROL_LAST_SEQ])
+        self.capture_process = self.context.Process(
+            target=capture_worker, args=(self.ring.spec, self.source, self.fps, tasks, generation), daemon=True
+        )
+        self.capture_process.start()
+
+    def _stop_capture(self):
+        if self.capture_process is None:
+            return
+        self.ring.control[CONTROL_CAPTURE_GENERATION] += 1
+        self.capture_process.join(timeout=2)
+        if self.capture_process.is_alive():
+            self.capture_process.terminate()
+            self.capture_process.join()
+
+    def _start_inference(self, worker_id):
+        task_receiver, task_sender = self.context.Pipe(duplex=False)
+        result_receiver, result_sender = self.context.Pipe(duplex=False)
+        process = self.context.Process(
+            target=inference_worker,
+            args=(self.ring.spec, worker_id, self.inference, task_receiver, result_sender),
+            daemon=True
+        )
+        process.start()
+        # Only the worker keeps these ends, so its death shows up as a broken pipe / EOF
+        task_receiver.close()
+        result_sender.close()
+
+        with self._lock:
+            old_tasks = self.task_connections.get(worker_id)
+            old_results = self.result_connections.get(worker_id)
+            self.task_connections[worker_id] = task_sender
+            self.result_connections[worker_id] = result_receiver
+            self.inference_processes[worker_id] = process
+        for connection in (old_tasks, old_results):
+            if connection is not None:
+                connection.close()
+
+    def start(self):
+        """Start capture, the inference workers and the supervisor (no-op if running)."""
+        with self._lifecycle_lock:
+            self._start()
+
+    def _start(self):
+        if self._running or self._stopped:
+            return
+        self._running = True
+        self.capture_failures = 0
+        self.capture_failed = False
+        self.started_at = time.monotonic()
+        self.ring.control[CONTROL_STOP] = 0
+        for worker_id in range(self.workers):
+            self._start_inference(worker_id)
+        self._start_capture()
+        self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+        self._supervisor.start()
+
+    def halt(self):
+        """Stop every process and release the camera, keeping the shared memory for a later start()."""
+        with self._lifecycle_lock:
+            self._halt()
+
+    def _halt(self):
+        self._running = False
+        if self._supervisor is not None:
+            self._supervisor.join()
+            self._supervisor = None
+        if self.ring.control is None:
+            return
+        self.ring.control[CONTROL_STOP] = 1
+        processes = list(self.inference_processes.values()) + [self.capture_process]
+        for process in processes:
+            if process is not None:
+                process.join(timeout=2)
+                if process.is_alive():
+                    process.terminate()
+        with self._lock:
+            for connection in list(self.task_connections.values()) + list(self.result_connections.values()):
+                connection.close()
+            self.task_connections.clear()
+            self.result_connections.clear()
+            self.inference_processes.clear()
+            self.capture_process = None
+            # Nothing runs any more, so every slot is free again
+            self.ring.owner[:] = 0
+            self.ring.state[:] = SLOT_FREE
+
+    def _reclaim(self, worker_id):
+        """Free the slots owned by a dead worker (queued for it, or finished but not yet reported)."""
+        with self._lock:
+            ring = self.ring
+            owned = (ring.owner == worker_id + 1) & ((ring.state == SLOT_CAPTURED) | (ring.state == SLOT_INFERRED))
+            ring.owner[owned] = 0
+            ring.state[owned] = SLOT_FREE
+            return int(owned.sum())
+
+    def _supervise(self):
+        while self._running:
+            time.sleep(0.5)
+            if not self._running:
+                break
+            dead = [worker_id for worker_id, process in self.inference_processes.items() if not process.is_alive()]
+            capture_died = self.capture_process is not None and not self.capture_process.is_alive()
+            if not dead and not capture_died:
+                continue
+
+            if capture_died:
+                # Count failures in a row; a capture that delivered frames before failing starts a new run
+                produced = self.ring.control[CONTROL_LAST_SEQ] > self._capture_seq
+                self.capture_failures = 1 if produced else self.capture_failures + 1
+                print(f"Capture process exited ({self.capture_process.exitcode}), "
+                      f"failure {self.capture_failures} of {self.max_capture_failures}")
+                if self.capture_failures >= self.max_capture_failures:
+                    print("Capture keeps failing, giving up")
+                    self.capture_failed = True
+                    # frames() sees this, ends and halts the pool
+                    self._running = False
+                    break
+
+            # Capture must be stopped before reclaiming: it could still be handing slots to a dead worker
+            self._stop_capture()
+            for worker_id in dead:
+                freed = self._reclaim(worker_id)
+                print(f"Vision worker {worker_id} exited ({self.inference_processes[worker_id].exitcode}), "
+                      f"restarting ({freed} slots freed)")
+                self._start_inference(worker_id)
+                self.restarts += 1
+            if capture_died:
+                self.restarts += 1
+            self._start_capture()
+
+    def set_inference(self, model_complexity, inference_scale):
+        """Inference settings picked up by the workers on their next frame."""
+        self.ring.control[CONTROL_MODEL_COMPLEXITY] = model_complexity
+        self.ring.control[CONTROL_INFERENCE_SCALE] = inference_scale
+
+    def _collect(self, timeout):
+        """Wait for finished (slot, seq) pairs from any worker."""
+        with self._lock:
+            connections = list(self.result_connections.values())
+        try:
+            readable = wait(connections, timeout)
+        except (OSError, ValueError):
+            # A pipe was closed by the supervisor while waiting on it
+            return []
+        ready = []
+        for connection in readable:
+            try:
+                while connection.poll():
+                    ready.append(connection.recv())
+            except (EOFError, OSError):
+                # The worker died; the supervisor replaces the pipe
+                with self._lock:
+                    for worker_id, current in list(self.result_connections.items()):
+                        if current is connection:
+                            del self.result_connections[worker_id]
+                            connection.close()
+        return ready
+
+    def frames(self, timeout=0.5):
+        """
+        Yield (frame, results, captured_at) for the newest inferred frame.
+        The frame is a view into shared memory; its slot is released when the
+        consumer asks for the next one. Older frames that finished late are skipped.
+        Starts the pool, and halts it once the last consumer's generator is
+        closed or capture has failed for good.
+        """
+        with self._lifecycle_lock:
+            self._consumers += 1
+            self._start()
+        try:
+            yield from self._frames(timeout)
+        finally:
+            with self._lifecycle_lock:
+                self._consumers -= 1
+                if self._consumers == 0:
+                    self._halt()
+
+    def _frames(self, timeout):
+        last_seq = 0
+        while self._running:
+            ready = self._collect(timeout)
+            if not ready:
+                continue
+
+            ready.sort(key=lambda item: item[1])
+            for slot, seq in ready[:-1]:
+                self._release(slot, seq)
+                self.stale += 1
+            slot, seq = ready[-1]
+            ring = self.ring
+            with self._lock:
+                current = seq > last_seq and ring.seq[slot] == seq and ring.state[slot] == SLOT_INFERRED
+                if current:
+                    ring.state[slot] = SLOT_READING
+            if not current:
+                self._release(slot, seq)
+                self.stale += 1
+                continue
+            last_seq = seq
+
+            received = time.monotonic()
+            inference_ms = (ring.times[slot, TIME_INFERRED] - ring.times[slot, TIME_INFERENCE_STARTED]) * 1000
+            handoff_ms = (received - ring.times[slot, TIME_CAPTURED]) * 1000 - inference_ms
+            self.handoff_ms = handoff_ms if self.handoff_ms is None else self.handoff_ms + 0.1 * (handoff_ms - self.handoff_ms)
+            self.delivered += 1
+
+            results = results_from_arrays(ring.landmarks[slot], ring.handedness[slot], int(ring.hand_count[slot]))
+            try:
+                yield ring.frames[slot], results, float(ring.times[slot, TIME_CAPTURED])
+            finally:
+                self._release(slot, seq)
+
+    def _release(self, slot, seq):
+        with self._lock:
+            ring = self.ring
+            if ring.seq is not None and ring.seq[slot] == seq and ring.state[slot] in (SLOT_INFERRED, SLOT_READING):
+                ring.owner[slot] = 0
+                ring.state[slot] = SLOT_FREE
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            "workers": self.workers,
+            "running": self._running,
+            "alive": sum(process.is_alive() for process in list(self.inference_processes.values())),
+            "delivered": self.delivered,
+            "fps": round(self.delivered / elapsed, 2) if elapsed else 0.0,
+            "dropped": int(self.ring.control[CONTROL_DROPPED]) if self.ring.control is not None else 0,
+            "stale": self.stale,
+            "restarts": self.restarts,
+            "capture_failed": self.capture_failed,
+            "handoff_ms": round(float(self.handoff_ms), 3) if self.handoff_ms is not None else None
+        }
+
+    def stop(self):
+        """Stop every process and free the shared memory. Safe to call more than once."""
+        if self._stopped:
+            return
+        self.halt()
+        self._stopped = True
+        with self._lock:
+            self.ring.close()
+        self.ring.unlink()